@@ -7,11 +7,11 @@ Run with: streamlit run ar_export_app.py
 """
 
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
+from gspread.utils import rowcol_to_a1
 from datetime import datetime
 import pandas as pd
-import io
+import hashlib
+from auth import get_worksheet
 
 # Page config
 st.set_page_config(
@@ -20,98 +20,123 @@ st.set_page_config(
     layout="wide"
 )
 
-# Google Auth
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
+# AXON B622 column order (must match the import template)
+AXON_COLUMNS = [
+    'Attachment', 'Customer', 'Location', 'Start Date', 'Reference',
+    'Ticket#', 'Truck#', 'Operator', 'Trailer#', 'Product',
+    'Actual Vol', 'Product2', 'From LSD', 'To LSD', 'Hours',
+    'Charge', 'Job Desc', 'Company', 'Status'
 ]
 
-@st.cache_resource
-def get_google_client():
-    """Connect to Google Sheets."""
-    if hasattr(st, 'secrets') and 'gcp_service_account' in st.secrets:
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-    else:
-        creds = Credentials.from_service_account_file('service_account.json', scopes=SCOPES)
-    return gspread.authorize(creds)
+# Ticket fields read by generate_axon_csv
+TICKET_FIELDS = [
+    'CUSTOMER', 'FROM LSD', 'TO LSD', 'ARRIVE LOAD', 'TICKET #', 'TRUCK',
+    'DRIVER', 'TRAILER', 'PRODUCT', 'ACTUAL VOLUME', 'HOURS'
+]
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_completed_tickets():
     """Get all completed tickets."""
-    client = get_google_client()
-    spreadsheet = client.open("Rick's TicketDrop 2.0")
-    completed = spreadsheet.worksheet('COMPLETED TICKETS')
+    completed = get_worksheet('COMPLETED TICKETS')
     records = completed.get_all_records()
     return records
 
-def mark_as_exported(ticket_numbers):
-    """Mark tickets as exported."""
-    client = get_google_client()
-    spreadsheet = client.open("Rick's TicketDrop 2.0")
-    completed = spreadsheet.worksheet('COMPLETED TICKETS')
+@st.cache_data(ttl=60, show_spinner=False)
+def get_completed_frame():
+    """Completed tickets as a DataFrame, built once per data refresh."""
+    df = pd.DataFrame(get_completed_tickets())
+    # Categoricals give O(1) option lists and integer-code comparisons
+    df['CUSTOMER'] = df['CUSTOMER'].astype('category')
+    df['DRIVER'] = df['DRIVER'].astype('category')
+    # Parse numeric columns once so the summary sums don't re-parse strings
+    for col in ('ACTUAL VOLUME', 'HOURS'):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+def mark_as_exported(ticket_numbers, records):
+    """Mark tickets as exported.
+    
+    `records` are the COMPLETED TICKETS rows already loaded by
+    get_completed_tickets(), so row numbers come from their position
+    instead of re-reading the sheet.
+    """
+    completed = get_worksheet('COMPLETED TICKETS')
     
-    data = completed.get_all_values()
-    headers = data[0]
+    headers = list(records[0].keys()) if records else []
     
     # Find column indices
-    ticket_col = headers.index('TICKET #') if 'TICKET #' in headers else 0
+    ticket_key = 'TICKET #' if 'TICKET #' in headers else (headers[0] if headers else None)
     exported_col = headers.index('EXPORTED') if 'EXPORTED' in headers else None
     exported_at_col = headers.index('EXPORTED AT') if 'EXPORTED AT' in headers else None
     
     if exported_col is None:
         return
     
-    for i, row in enumerate(data[1:], start=2):
-        if row[ticket_col] in ticket_numbers:
-            completed.update_cell(i, exported_col + 1, 'Y')
-            if exported_at_col:
-                completed.update_cell(i, exported_at_col + 1, datetime.now().isoformat())
+    # Collect every edit and send them in one request instead of 2 per ticket
+    wanted = {str(t) for t in ticket_numbers}
+    now = datetime.now().isoformat()
+    updates = []
+    for i, record in enumerate(records, start=2):
+        if str(record.get(ticket_key, '')) in wanted:
+            updates.append({'range': rowcol_to_a1(i, exported_col + 1), 'values': [['Y']]})
+            if exported_at_col is not None:
+                updates.append({'range': rowcol_to_a1(i, exported_at_col + 1), 'values': [[now]]})
+    
+    if updates:
+        completed.batch_update(updates, value_input_option='USER_ENTERED')
 
-def format_operator_name(driver_name):
-    """Convert 'First Last' to 'Last, First' for AXON."""
-    parts = driver_name.strip().split()
-    if len(parts) >= 2:
-        return f"{parts[-1]}, {parts[0]}"
-    return driver_name
+def format_operator_names(drivers):
+    """Convert a Series of 'First Last' names to 'Last, First' for AXON."""
+    # First and last whitespace-separated words; single-word names are left as-is
+    return drivers.str.replace(r'^\s*(\S+)(?:\s+\S+)*?\s+(\S+)\s*$', r'\2, \1', regex=True)
 
-def format_date_for_axon(iso_timestamp):
-    """Convert ISO timestamp to DD-MM-YYYY HH:MM format."""
-    try:
-        dt = datetime.fromisoformat(iso_timestamp.replace('Z', '+00:00'))
-        return dt.strftime("%d-%m-%Y %H:%M")
-    except:
-        return iso_timestamp
+def format_dates_for_axon(timestamps):
+    """Convert a Series of ISO timestamps to DD-MM-YYYY HH:MM format.
+    
+    The UTC offset is dropped before parsing so mixed offsets still parse and
+    the wall-clock time is kept. Unparseable values are passed through as-is.
+    """
+    local = timestamps.str.replace(r'(Z|[+-]\d{2}:?\d{2})$', '', regex=True)
+    parsed = pd.to_datetime(local, errors='coerce', format='ISO8601')
+    return parsed.dt.strftime("%d-%m-%Y %H:%M").where(parsed.notna(), timestamps)
 
 def generate_axon_csv(tickets):
     """Generate AXON B622 format CSV."""
-    rows = []
+    src = pd.DataFrame(tickets, dtype=object).reindex(columns=TICKET_FIELDS).fillna('')
+    text = src.astype(str)
     
-    for ticket in tickets:
-        row = {
-            'Attachment': 'FALSE',
-            'Customer': ticket.get('CUSTOMER', ''),
-            'Location': f"{ticket.get('FROM LSD', '')} to {ticket.get('TO LSD', '')}",
-            'Start Date': format_date_for_axon(ticket.get('ARRIVE LOAD', '')),
-            'Reference': '',
-            'Ticket#': ticket.get('TICKET #', ''),
-            'Truck#': ticket.get('TRUCK', ''),
-            'Operator': format_operator_name(ticket.get('DRIVER', '')),
-            'Trailer#': ticket.get('TRAILER', ''),
-            'Product': ticket.get('PRODUCT', ''),
-            'Actual Vol': ticket.get('ACTUAL VOLUME', ''),
-            'Product2': '',
-            'From LSD': ticket.get('FROM LSD', ''),
-            'To LSD': ticket.get('TO LSD', ''),
-            'Hours': ticket.get('HOURS', ''),
-            'Charge': '',
-            'Job Desc': f"{ticket.get('PRODUCT', '')} - {ticket.get('CUSTOMER', '')}",
-            'Company': "Rick's Oilfield Hauling",
-            'Status': 'Completed'
-        }
-        rows.append(row)
+    df = pd.DataFrame(index=src.index)
+    df['Attachment'] = 'FALSE'
+    df['Customer'] = src['CUSTOMER']
+    df['Location'] = text['FROM LSD'] + ' to ' + text['TO LSD']
+    df['Start Date'] = format_dates_for_axon(text['ARRIVE LOAD'])
+    df['Reference'] = ''
+    df['Ticket#'] = src['TICKET #']
+    df['Truck#'] = src['TRUCK']
+    df['Operator'] = format_operator_names(text['DRIVER'])
+    df['Trailer#'] = src['TRAILER']
+    df['Product'] = src['PRODUCT']
+    df['Actual Vol'] = src['ACTUAL VOLUME']
+    df['Product2'] = ''
+    df['From LSD'] = src['FROM LSD']
+    df['To LSD'] = src['TO LSD']
+    df['Hours'] = src['HOURS']
+    df['Charge'] = ''
+    df['Job Desc'] = text['PRODUCT'] + ' - ' + text['CUSTOMER']
+    df['Company'] = "Rick's Oilfield Hauling"
+    df['Status'] = 'Completed'
     
-    df = pd.DataFrame(rows)
-    return df
+    return df[AXON_COLUMNS]
+
+def export_key(tickets):
+    """Short stable hash of the ticket numbers, used in export file names.
+    
+    File names (and the download widget) stay the same across reruns for
+    the same ticket set.
+    """
+    ticket_numbers = sorted(str(t.get('TICKET #', '')) for t in tickets)
+    return hashlib.blake2b(','.join(ticket_numbers).encode(), digest_size=8).hexdigest()
 
 # ============================================================
 # MAIN APP
@@ -142,8 +167,9 @@ def main():
         st.stop()
     
     # Split into exported and not exported
-    unexported = [t for t in all_tickets if t.get('EXPORTED', '').upper() != 'Y']
-    exported = [t for t in all_tickets if t.get('EXPORTED', '').upper() == 'Y']
+    exported, unexported = [], []
+    for t in all_tickets:
+        (exported if t.get('EXPORTED') in ('Y', 'y') else unexported).append(t)
     
     # ============================================================
     # TABS
@@ -175,26 +201,21 @@ def main():
             
             with col1:
                 # Generate CSV
-                axon_df = generate_axon_csv(unexported)
+                # Preview only formats the rows it shows
+                preview_df = generate_axon_csv(unexported[:5])
                 
-                # Preview
                 st.markdown("**Preview (first 5 rows):**")
-                st.dataframe(axon_df.head(), use_container_width=True, hide_index=True)
+                st.dataframe(preview_df, use_container_width=True, hide_index=True)
             
             with col2:
                 st.markdown("**Download CSV:**")
                 
-                # Create download
-                csv_buffer = io.StringIO()
-                axon_df.to_csv(csv_buffer, index=False)
-                csv_data = csv_buffer.getvalue()
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"AXON_Export_{timestamp}.csv"
+                # Create download (the full CSV is only built when clicked)
+                filename = f"AXON_Export_{export_key(unexported)}.csv"
                 
                 st.download_button(
                     label="📥 DOWNLOAD AXON CSV",
-                    data=csv_data,
+                    data=lambda: generate_axon_csv(unexported).to_csv(index=False),
                     file_name=filename,
                     mime="text/csv",
                     use_container_width=True,
@@ -207,7 +228,7 @@ def main():
                 st.markdown("**After importing to AXON:**")
                 if st.button("✅ Mark All as Exported", use_container_width=True):
                     ticket_numbers = [t.get('TICKET #') for t in unexported]
-                    mark_as_exported(ticket_numbers)
+                    mark_as_exported(ticket_numbers, all_tickets)
                     st.success(f"✅ Marked {len(ticket_numbers)} tickets as exported!")
                     st.cache_data.clear()
                     st.rerun()
@@ -234,16 +255,10 @@ def main():
             st.markdown("**Need to re-export?**")
             
             if st.button("📥 Download All Exported (CSV)", use_container_width=True):
-                axon_df = generate_axon_csv(exported)
-                csv_buffer = io.StringIO()
-                axon_df.to_csv(csv_buffer, index=False)
-                csv_data = csv_buffer.getvalue()
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 st.download_button(
                     label="📥 Download CSV",
-                    data=csv_data,
-                    file_name=f"AXON_ReExport_{timestamp}.csv",
+                    data=lambda: generate_axon_csv(exported).to_csv(index=False),
+                    file_name=f"AXON_ReExport_{export_key(exported)}.csv",
                     mime="text/csv"
                 )
     
@@ -253,35 +268,38 @@ def main():
     with tab3:
         st.markdown(f"### 📋 All Completed Tickets ({len(all_tickets)})")
         
-        df_all = pd.DataFrame(all_tickets)
+        df_all = get_completed_frame()
         
         # Filters
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            customers = ['All'] + list(df_all['CUSTOMER'].unique())
+            customers = ['All'] + df_all['CUSTOMER'].cat.categories.tolist()
             filter_customer = st.selectbox("Filter by Customer", customers)
         
         with col2:
-            drivers = ['All'] + list(df_all['DRIVER'].unique())
+            drivers = ['All'] + df_all['DRIVER'].cat.categories.tolist()
             filter_driver = st.selectbox("Filter by Driver", drivers)
         
         with col3:
             export_status = st.selectbox("Export Status", ['All', 'Exported', 'Not Exported'])
         
-        # Apply filters
-        filtered = df_all.copy()
+        # Apply filters as one combined mask
+        exported_mask = df_all['EXPORTED'].isin(['Y', 'y'])
+        mask = pd.Series(True, index=df_all.index)
         
         if filter_customer != 'All':
-            filtered = filtered[filtered['CUSTOMER'] == filter_customer]
+            mask &= df_all['CUSTOMER'].eq(filter_customer)
         
         if filter_driver != 'All':
-            filtered = filtered[filtered['DRIVER'] == filter_driver]
+            mask &= df_all['DRIVER'].eq(filter_driver)
         
         if export_status == 'Exported':
-            filtered = filtered[filtered['EXPORTED'].str.upper() == 'Y']
+            mask &= exported_mask
         elif export_status == 'Not Exported':
-            filtered = filtered[filtered['EXPORTED'].str.upper() != 'Y']
+            mask &= ~exported_mask
+        
+        filtered = df_all[mask]
         
         # Display
         display_cols = ['TICKET #', 'DATE', 'CUSTOMER', 'DRIVER', 'PRODUCT', 'ACTUAL VOLUME', 'HOURS', 'EXPORTED']
@@ -300,20 +318,20 @@ def main():
         
         with col2:
             try:
-                total_volume = filtered['ACTUAL VOLUME'].astype(float).sum()
+                total_volume = filtered['ACTUAL VOLUME'].sum()
                 st.metric("Total Volume", f"{total_volume:,.1f} m³")
             except:
                 st.metric("Total Volume", "N/A")
         
         with col3:
             try:
-                total_hours = filtered['HOURS'].astype(float).sum()
+                total_hours = filtered['HOURS'].sum()
                 st.metric("Total Hours", f"{total_hours:,.1f}")
             except:
                 st.metric("Total Hours", "N/A")
         
         with col4:
-            exported_count = len(filtered[filtered['EXPORTED'].str.upper() == 'Y'])
+            exported_count = int(exported_mask[mask].sum())
             st.metric("Exported", f"{exported_count}/{len(filtered)}")
     
     # Footer
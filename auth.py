@@ -6,12 +6,15 @@ import gspread
 import streamlit as st
 import os
 from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets',
     'https://www.googleapis.com/auth/drive'
 ]
 
+@st.cache_resource
 def get_google_client():
     if hasattr(st, 'secrets') and 'gcp_service_account' in st.secrets:
         creds_dict = dict(st.secrets["gcp_service_account"])
@@ -23,12 +26,20 @@ def get_google_client():
     else:
         raise FileNotFoundError("No Google credentials found")
     
-    return gspread.authorize(credentials)
+    client = gspread.authorize(credentials)
+    # Retry rate limits (429) and brief unavailability (503) and keep a pooled connection
+    # across reruns; neither applies the request, so retried batchUpdates cannot duplicate rows
+    retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 503],
+                  allowed_methods=frozenset(['GET', 'POST', 'PUT']), raise_on_status=False)
+    client.http_client.session.mount('https://', HTTPAdapter(max_retries=retry, pool_connections=10, pool_maxsize=20))
+    return client
 
+@st.cache_resource
 def get_spreadsheet(spreadsheet_name="Rick's TicketDrop 2.0"):
     client = get_google_client()
     return client.open(spreadsheet_name)
 
+@st.cache_resource
 def get_worksheet(sheet_name, spreadsheet_name="Rick's TicketDrop 2.0"):
     spreadsheet = get_spreadsheet(spreadsheet_name)
     return spreadsheet.worksheet(sheet_name)
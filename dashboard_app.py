@@ -7,9 +7,12 @@ Run with: streamlit run dashboard_app.py
 """
 
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import datetime, timedelta
+from functools import reduce
+from itertools import zip_longest
+import operator
+import pandas as pd
+from auth import get_spreadsheet
 
 # Page config - WIDE layout like AssetWorks
 st.set_page_config(
@@ -97,60 +100,101 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Google Auth
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+# Every range the dashboard needs, fetched in one values.batchGet request
+DASHBOARD_RANGES = ["'ACTIVE TICKETS'", "'COMPLETED TICKETS'", "SETTINGS!A:E"]
 
-def get_client():
-    if hasattr(st, 'secrets') and 'gcp_service_account' in st.secrets:
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-    else:
-        creds = Credentials.from_service_account_file('service_account.json', scopes=SCOPES)
-    return gspread.authorize(creds)
+# The only columns the cached ticket frame keeps; missing ones are filled with ''
+TICKET_COLUMNS = [
+    'TICKET #', 'DATE', 'CUSTOMER', 'FROM LSD', 'TO LSD', 'PRODUCT', 'DRIVER',
+    'TRUCK', 'TRAILER', 'EST VOLUME', 'ACTUAL VOLUME', 'HOURS', 'ARRIVE LOAD',
+    'CUSTOMER TICKET', 'CONSIGNOR LOAD', 'EXPORTED', 'TICKET STATE'
+]
 
+# Low-cardinality columns stored as categoricals for cheap equality filters
+CATEGORY_COLUMNS = ['CUSTOMER', 'TRUCK', 'TRAILER', 'DRIVER', 'PRODUCT', 'TICKET STATE']
+
+def to_frame(values):
+    """Turn a header row + data rows into a DataFrame of strings."""
+    if not values:
+        return pd.DataFrame()
+    headers = values[0]
+    width = len(headers)
+    # Sheets trims trailing empty header cells, so data rows can be wider
+    # than the header row as well as shorter
+    return pd.DataFrame([(row + [''] * width)[:width] for row in values[1:]], columns=headers)
+
+def project_columns(frame):
+    """Keep only TICKET_COLUMNS, adding any the sheet lacks as ''."""
+    frame = frame.loc[:, ~frame.columns.duplicated()]
+    return frame.reindex(columns=TICKET_COLUMNS, fill_value='')
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_sheet_values():
+    """Fetch ACTIVE TICKETS, COMPLETED TICKETS and SETTINGS in one request."""
+    spreadsheet = get_spreadsheet()
+    try:
+        value_ranges = spreadsheet.values_batch_get(DASHBOARD_RANGES)['valueRanges']
+    except Exception:
+        # One missing or renamed tab fails the whole batch; read the ranges
+        # one by one so only the broken sheet comes back empty
+        value_ranges = []
+        for sheet_range in DASHBOARD_RANGES:
+            try:
+                value_ranges.append(spreadsheet.values_get(sheet_range))
+            except Exception:
+                value_ranges.append({})
+    active, completed, settings = (vr.get('values', []) for vr in value_ranges)
+    return active, completed, settings
+
+@st.cache_data(ttl=60, show_spinner=False)
 def load_all_tickets():
-    """Load tickets from all sheets."""
-    client = get_client()
-    spreadsheet = client.open("Rick's TicketDrop 2.0")
-    
-    all_tickets = []
+    """Load tickets from all sheets into one DataFrame."""
+    active_values, completed_values, _ = load_sheet_values()
     
-    # Active tickets
+    # Active tickets; a sheet that can't be parsed is shown as empty
     try:
-        active = spreadsheet.worksheet('ACTIVE TICKETS')
-        for t in active.get_all_records():
-            t['TICKET STATE'] = t.get('STATUS', 'NEW')
-            if t['TICKET STATE'] == 'ASSIGNED':
-                t['TICKET STATE'] = 'NEW'
-            all_tickets.append(t)
-    except Exception as e:
-        pass
+        active = to_frame(active_values)
+        state = active['STATUS'].replace('ASSIGNED', 'NEW') if 'STATUS' in active.columns else 'NEW'
+        active = project_columns(active)
+    except Exception:
+        active, state = project_columns(pd.DataFrame()), 'NEW'
+    active['TICKET STATE'] = state
     
     # Completed tickets
     try:
-        completed = spreadsheet.worksheet('COMPLETED TICKETS')
-        for t in completed.get_all_records():
-            t['TICKET STATE'] = 'COMPLETED'
-            all_tickets.append(t)
-    except:
-        pass
-    
-    return all_tickets
+        completed = project_columns(to_frame(completed_values))
+    except Exception:
+        completed = project_columns(pd.DataFrame())
+    completed['TICKET STATE'] = 'COMPLETED'
+    
+    df = pd.concat([active, completed], ignore_index=True)
+    # String-typed once here so the reference filter needs no per-keystroke cast
+    df['TICKET #'] = df['TICKET #'].astype(str)
+    # Operator shown as "Last, First"; single-word names are left as-is
+    df['DRIVER_FMT'] = df['DRIVER'].astype(str).str.replace(
+        r'^\s*(\S+)(?:\s+\S+)*?\s+(\S+)\s*$', r'\2, \1', regex=True)
+    # Lowercased "FROM TO" text for the location filter, built once per refresh
+    df['LOC_LC'] = (df['FROM LSD'].astype(str) + ' ' + df['TO LSD'].astype(str)).str.lower()
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype('category')
+    
+    return df
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_state_counts():
+    """Ticket counts per TICKET STATE, computed once per data refresh."""
+    return load_all_tickets()['TICKET STATE'].value_counts().to_dict()
 
+@st.cache_data(ttl=60, show_spinner=False)
 def load_settings():
     """Load settings for filters."""
-    client = get_client()
-    sheet = client.open("Rick's TicketDrop 2.0").worksheet('SETTINGS')
-    data = sheet.get_all_values()
-    
-    drivers, customers, products, trucks, trailers = [], [], [], [], []
-    if data:
-        for row in data[1:]:
-            if len(row) > 0 and row[0]: drivers.append(row[0])
-            if len(row) > 1 and row[1]: customers.append(row[1])
-            if len(row) > 2 and row[2]: products.append(row[2])
-            if len(row) > 3 and row[3]: trucks.append(row[3])
-            if len(row) > 4 and row[4]: trailers.append(row[4])
+    _, _, data = load_sheet_values()
+    
+    # Transpose rows into columns once; ragged rows are padded with ''
+    columns = list(zip_longest(*data[1:], fillvalue=''))[:5]
+    columns += [()] * (5 - len(columns))
+    # Deduped and sorted here (cached) rather than per render in the filter row
+    drivers, customers, products, trucks, trailers = (tuple(sorted({v for v in col if v})) for col in columns)
     
     return drivers, customers, products, trucks, trailers
 
@@ -222,9 +266,10 @@ with col_main:
     col1, col2, col3, col4, col5, col6 = st.columns(6)
     
     # Count by state
-    new_count = len([t for t in all_tickets if t.get('TICKET STATE') == 'NEW'])
-    active_count = len([t for t in all_tickets if t.get('TICKET STATE') == 'IN_PROGRESS'])
-    completed_count = len([t for t in all_tickets if t.get('TICKET STATE') == 'COMPLETED'])
+    state_counts = load_state_counts()
+    new_count = state_counts.get('NEW', 0)
+    active_count = state_counts.get('IN_PROGRESS', 0)
+    completed_count = state_counts.get('COMPLETED', 0)
     
     with col1:
         show_all = st.button(f"📋 All ({len(all_tickets)})", use_container_width=True)
@@ -265,7 +310,7 @@ with col_main:
         st.markdown("**☑️**")
     with cols[1]:
         st.markdown("**Customer Name**")
-        filter_customer = st.selectbox("cust", ['Filter'] + list(set(customers)), label_visibility="collapsed", key="f_cust")
+        filter_customer = st.selectbox("cust", ['Filter'] + list(customers), label_visibility="collapsed", key="f_cust")
     with cols[2]:
         st.markdown("**Location**")
         filter_location = st.text_input("loc", placeholder="Filter", label_visibility="collapsed", key="f_loc")
@@ -280,16 +325,16 @@ with col_main:
         filter_cust_ticket = st.text_input("ct", placeholder="Filter", label_visibility="collapsed", key="f_ct")
     with cols[6]:
         st.markdown("**Truck #**")
-        filter_truck = st.selectbox("truck", ['Filter'] + list(set(trucks)), label_visibility="collapsed", key="f_truck")
+        filter_truck = st.selectbox("truck", ['Filter'] + list(trucks), label_visibility="collapsed", key="f_truck")
     with cols[7]:
         st.markdown("**Trailer #**")
-        filter_trailer = st.selectbox("trailer", ['Filter'] + list(set(trailers)), label_visibility="collapsed", key="f_trail")
+        filter_trailer = st.selectbox("trailer", ['Filter'] + list(trailers), label_visibility="collapsed", key="f_trail")
     with cols[8]:
         st.markdown("**Operator**")
-        filter_driver = st.selectbox("driver", ['Filter'] + list(set(drivers)), label_visibility="collapsed", key="f_drv")
+        filter_driver = st.selectbox("driver", ['Filter'] + list(drivers), label_visibility="collapsed", key="f_drv")
     with cols[9]:
         st.markdown("**Product**")
-        filter_product = st.selectbox("prod", ['Filter'] + list(set(products)), label_visibility="collapsed", key="f_prod")
+        filter_product = st.selectbox("prod", ['Filter'] + list(products), label_visibility="collapsed", key="f_prod")
     with cols[10]:
         st.markdown("**Volume**")
     with cols[11]:
@@ -301,44 +346,29 @@ with col_main:
     # APPLY FILTERS
     # ============================================================
     
-    filtered = []
-    for t in all_tickets:
-        # State filter
-        if st.session_state.state_filter != 'All':
-            if t.get('TICKET STATE') != st.session_state.state_filter:
-                continue
-        
-        # Customer filter
-        if filter_customer != 'Filter' and t.get('CUSTOMER') != filter_customer:
-            continue
-        
-        # Location filter
-        if filter_location:
-            loc_str = f"{t.get('FROM LSD', '')} {t.get('TO LSD', '')}".lower()
-            if filter_location.lower() not in loc_str:
-                continue
-        
-        # Truck filter
-        if filter_truck != 'Filter' and t.get('TRUCK') != filter_truck:
-            continue
-        
-        # Trailer filter
-        if filter_trailer != 'Filter' and t.get('TRAILER') != filter_trailer:
-            continue
-        
-        # Driver filter
-        if filter_driver != 'Filter' and t.get('DRIVER') != filter_driver:
-            continue
-        
-        # Product filter
-        if filter_product != 'Filter' and t.get('PRODUCT') != filter_product:
-            continue
-        
-        # Reference filter
-        if filter_ref and filter_ref not in str(t.get('TICKET #', '')):
-            continue
-        
-        filtered.append(t)
+    # Only active filters build a mask
+    conditions = []
+    
+    # State filter
+    if st.session_state.state_filter != 'All':
+        conditions.append(all_tickets['TICKET STATE'].eq(st.session_state.state_filter))
+    
+    # Exact-match dropdown filters
+    for col, value in [('CUSTOMER', filter_customer), ('TRUCK', filter_truck), ('TRAILER', filter_trailer),
+                       ('DRIVER', filter_driver), ('PRODUCT', filter_product)]:
+        if value != 'Filter':
+            conditions.append(all_tickets[col].eq(value))
+    
+    # Location filter
+    if filter_location:
+        conditions.append(all_tickets['LOC_LC'].str.contains(filter_location.lower(), regex=False, na=False))
+    
+    # Reference filter
+    if filter_ref:
+        conditions.append(all_tickets['TICKET #'].str.contains(filter_ref, regex=False, na=False))
+    
+    # No filters (the landing page): use the cached frame as-is
+    filtered = all_tickets[reduce(operator.and_, conditions)] if conditions else all_tickets
     
     # ============================================================
     # TICKET TABLE (Like AssetWorks)
@@ -346,78 +376,31 @@ with col_main:
     
     st.markdown(f"**Showing {len(filtered)}/{len(all_tickets)}**")
     
-    # Table header
-    header_cols = st.columns([1, 2, 3, 2, 2, 2, 1, 1, 2, 1, 1, 1])
-    headers = ["☑️", "Customer", "Location", "Start Date", "Ref #", "Cust Ticket", "Truck", "Trailer", "Operator", "Product", "Vol", "Hrs"]
-    
-    for i, h in enumerate(headers):
-        with header_cols[i]:
-            st.markdown(f"**{h}**")
-    
-    # Table rows
-    for idx, t in enumerate(filtered[:100]):  # Limit to 100 rows
-        row_cols = st.columns([1, 2, 3, 2, 2, 2, 1, 1, 2, 1, 1, 1])
-        
-        # Checkbox
-        with row_cols[0]:
-            st.checkbox("", key=f"chk_{idx}", label_visibility="collapsed")
-        
-        # Customer
-        with row_cols[1]:
-            st.markdown(f"<small>{t.get('CUSTOMER', '')[:20]}</small>", unsafe_allow_html=True)
-        
-        # Location
-        with row_cols[2]:
-            from_loc = t.get('FROM LSD', '')[:15]
-            to_loc = t.get('TO LSD', '')[:15]
-            st.markdown(f"<small>{from_loc} To {to_loc}</small>", unsafe_allow_html=True)
-        
-        # Start Date
-        with row_cols[3]:
-            date_str = t.get('DATE', '') or t.get('ARRIVE LOAD', '')
-            st.markdown(f"<small>{str(date_str)[:16]}</small>", unsafe_allow_html=True)
-        
-        # Reference #
-        with row_cols[4]:
-            st.markdown(f"<small>{t.get('TICKET #', '')}</small>", unsafe_allow_html=True)
-        
-        # Customer Ticket
-        with row_cols[5]:
-            cust_ticket = t.get('CUSTOMER TICKET', '') or t.get('CONSIGNOR LOAD', '')
-            st.markdown(f"<small>{cust_ticket}</small>", unsafe_allow_html=True)
-        
-        # Truck
-        with row_cols[6]:
-            st.markdown(f"<small>{t.get('TRUCK', '')}</small>", unsafe_allow_html=True)
-        
-        # Trailer
-        with row_cols[7]:
-            st.markdown(f"<small>{t.get('TRAILER', '')}</small>", unsafe_allow_html=True)
-        
-        # Operator
-        with row_cols[8]:
-            driver = t.get('DRIVER', '')
-            # Format as "Last, First" if possible
-            parts = driver.split()
-            if len(parts) >= 2:
-                driver_formatted = f"{parts[-1]}, {parts[0]}"
-            else:
-                driver_formatted = driver
-            st.markdown(f"<small>{driver_formatted}</small>", unsafe_allow_html=True)
-        
-        # Product
-        with row_cols[9]:
-            st.markdown(f"<small>{t.get('PRODUCT', '')[:10]}</small>", unsafe_allow_html=True)
-        
-        # Volume
-        with row_cols[10]:
-            vol = t.get('ACTUAL VOLUME', '') or t.get('EST VOLUME', '')
-            st.markdown(f"<small>{vol}</small>", unsafe_allow_html=True)
-        
-        # Hours
-        with row_cols[11]:
-            hrs = t.get('HOURS', '')
-            st.markdown(f"<small>{hrs}</small>", unsafe_allow_html=True)
+    # Build the visible page of rows column-wise and render it as one widget
+    page = filtered.head(100).astype(str)
+    table = pd.DataFrame({
+        'Select': False,
+        'Customer': page['CUSTOMER'].str.slice(0, 20),
+        'Location': page['FROM LSD'].str.slice(0, 15) + ' To ' + page['TO LSD'].str.slice(0, 15),
+        'Start Date': page['DATE'].where(page['DATE'] != '', page['ARRIVE LOAD']).str.slice(0, 16),
+        'Ref #': page['TICKET #'],
+        'Cust Ticket': page['CUSTOMER TICKET'].where(page['CUSTOMER TICKET'] != '', page['CONSIGNOR LOAD']),
+        'Truck': page['TRUCK'],
+        'Trailer': page['TRAILER'],
+        'Operator': page['DRIVER_FMT'],
+        'Product': page['PRODUCT'].str.slice(0, 10),
+        'Vol': page['ACTUAL VOLUME'].where(page['ACTUAL VOLUME'] != '', page['EST VOLUME']),
+        'Hrs': page['HOURS'],
+    }, index=page.index)
+    
+    st.data_editor(
+        table,
+        key="ticket_table",
+        hide_index=True,
+        use_container_width=True,
+        column_config={'Select': st.column_config.CheckboxColumn("☑️")},
+        disabled=[c for c in table.columns if c != 'Select'],
+    )
     
     if len(filtered) > 100:
         st.warning(f"Showing first 100 of {len(filtered)} tickets. Use filters to narrow down.")
@@ -428,21 +411,23 @@ with col_main:
     
     st.markdown("---")
     
+    volume = filtered['ACTUAL VOLUME'].where(filtered['ACTUAL VOLUME'] != '', filtered['EST VOLUME'])
+    total_vol = pd.to_numeric(volume, errors='coerce').sum()
+    total_hrs = pd.to_numeric(filtered['HOURS'], errors='coerce').sum()
+    exported = int(filtered['EXPORTED'].str.upper().eq('Y').sum())
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.markdown(f"**Showing {len(filtered)}/{len(all_tickets)}**")
     
     with col2:
-        total_vol = sum(float(t.get('ACTUAL VOLUME') or t.get('EST VOLUME') or 0) for t in filtered if t.get('ACTUAL VOLUME') or t.get('EST VOLUME'))
         st.markdown(f"**Total Volume: {total_vol:,.1f} m³**")
     
     with col3:
-        total_hrs = sum(float(t.get('HOURS') or 0) for t in filtered if t.get('HOURS'))
         st.markdown(f"**Total Hours: {total_hrs:,.1f}**")
     
     with col4:
-        exported = len([t for t in filtered if str(t.get('EXPORTED', '')).upper() == 'Y'])
         st.markdown(f"**Exported: {exported}/{len(filtered)}**")
 
 # Footer
@@ -7,10 +7,9 @@ Run with: streamlit run dispatch_app.py
 """
 
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import datetime
 import os
+from auth import get_spreadsheet, get_worksheet
 
 # Page config
 st.set_page_config(
@@ -19,25 +18,20 @@ st.set_page_config(
     layout="wide"
 )
 
-# Google Auth
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
+# SETTINGS and ACTIVE TICKETS are both shown on every render, so they are
+# fetched together in one values.batchGet request
+DISPATCH_RANGES = ["SETTINGS!A:E", "'ACTIVE TICKETS'"]
 
-@st.cache_resource
-def get_google_client():
-    """Connect to Google Sheets."""
-    creds = Credentials.from_service_account_info(dict(st.secrets["gcp_service_account"]), scopes=SCOPES) if hasattr(st, "secrets") and "gcp_service_account" in st.secrets else Credentials.from_service_account_file("service_account.json", scopes=SCOPES)
-    return gspread.authorize(creds)
+@st.cache_data(ttl=15)
+def load_sheet_values():
+    """Fetch SETTINGS and ACTIVE TICKETS in one request."""
+    response = get_spreadsheet().values_batch_get(DISPATCH_RANGES)
+    settings, active = (vr.get('values', []) for vr in response['valueRanges'])
+    return settings, active
 
-@st.cache_data(ttl=60)
 def load_settings():
     """Load dropdown options from SETTINGS tab."""
-    client = get_google_client()
-    spreadsheet = client.open("Rick's TicketDrop 2.0")
-    settings = spreadsheet.worksheet('SETTINGS')
-    data = settings.get_all_values()
+    data = load_sheet_values()[0]
     
     if not data:
         return {}, {}, {}, {}, {}
@@ -58,25 +52,25 @@ def load_settings():
         columns.get('TRAILERS', [])
     )
 
-def generate_ticket_number(client):
+def generate_ticket_number():
     """Generate next ticket number (YYMMDDXXX format)."""
     today = datetime.now()
     prefix = today.strftime("%y%m%d")
     
-    spreadsheet = client.open("Rick's TicketDrop 2.0")
+    spreadsheet = get_spreadsheet()
     existing = []
     
-    for sheet_name in ['DISPATCH BOARD', 'ACTIVE TICKETS', 'COMPLETED TICKETS']:
-        try:
-            ws = spreadsheet.worksheet(sheet_name)
-            records = ws.get_all_values()
-            for row in records[1:]:  # Skip header
-                if row and row[0].startswith(prefix):
-                    existing.append(row[0])
-                elif row and len(row) > 1 and row[1].startswith(prefix):
-                    existing.append(row[1])
-        except:
-            continue
+    # Ticket # is column B of DISPATCH BOARD and column A of ACTIVE/COMPLETED;
+    # read just that column of each sheet in a single request
+    ranges = ["'DISPATCH BOARD'!B2:B", "'ACTIVE TICKETS'!A2:A", "'COMPLETED TICKETS'!A2:A"]
+    try:
+        value_ranges = spreadsheet.values_batch_get(ranges, params={'majorDimension': 'COLUMNS'}).get('valueRanges', [])
+    except Exception:
+        value_ranges = []
+    
+    for value_range in value_ranges:
+        for column in value_range.get('values', []):
+            existing.extend(num for num in column if num.startswith(prefix))
     
     if not existing:
         return f"{prefix}001"
@@ -93,14 +87,11 @@ def generate_ticket_number(client):
 
 def create_ticket(ticket_data):
     """Create a new ticket in DISPATCH BOARD."""
-    client = get_google_client()
-    spreadsheet = client.open("Rick's TicketDrop 2.0")
-    
     # Generate ticket number
-    ticket_number = generate_ticket_number(client)
+    ticket_number = generate_ticket_number()
     
     # Add to DISPATCH BOARD
-    dispatch = spreadsheet.worksheet('DISPATCH BOARD')
+    dispatch = get_worksheet('DISPATCH BOARD')
     
     row = [
         '',  # CREATE checkbox
@@ -118,10 +109,8 @@ def create_ticket(ticket_data):
         ticket_data.get('priority', 'Normal')
     ]
     
-    dispatch.append_row(row)
-    
     # Also add to ACTIVE TICKETS so driver can see it
-    active = spreadsheet.worksheet('ACTIVE TICKETS')
+    active = get_worksheet('ACTIVE TICKETS')
     active_row = [
         ticket_number,
         datetime.now().strftime("%Y-%m-%d"),
@@ -143,17 +132,26 @@ def create_ticket(ticket_data):
         datetime.now().isoformat(),  # Created at
         ''  # Updated at
     ]
-    active.append_row(active_row)
+    
+    # Append both rows in a single batchUpdate request
+    get_spreadsheet().batch_update({'requests': [
+        {'appendCells': {
+            'sheetId': sheet.id,
+            'rows': [{'values': [{'userEnteredValue': {'stringValue': str(v)}} for v in values]}],
+            'fields': 'userEnteredValue',
+        }}
+        for sheet, values in [(dispatch, row), (active, active_row)]
+    ]})
     
     return ticket_number
 
 def get_active_tickets():
     """Get list of active tickets."""
-    client = get_google_client()
-    spreadsheet = client.open("Rick's TicketDrop 2.0")
-    active = spreadsheet.worksheet('ACTIVE TICKETS')
-    records = active.get_all_records()
-    return records
+    values = load_sheet_values()[1]
+    if not values:
+        return []
+    headers = values[0]
+    return [dict(zip(headers, row)) for row in values[1:]]
 
 # ============================================================
 # MAIN APP
@@ -282,6 +280,7 @@ def main():
             if not tickets:
                 st.info("No active tickets. Create one! 👈")
             else:
+                cards = []
                 for ticket in tickets:
                     ticket_num = ticket.get('TICKET #', 'Unknown')
                     customer = ticket.get('CUSTOMER', '')
@@ -310,21 +309,23 @@ def main():
                     else:
                         priority_badge = ''
                     
-                    with st.container():
-                        st.markdown(f"""
-                        <div style='background: #1E1E1E; padding: 15px; border-radius: 10px; margin-bottom: 10px; border-left: 4px solid {"#ff4444" if priority != "Normal" else "#4CAF50"};'>
-                            <div style='display: flex; justify-content: space-between;'>
-                                <strong style='font-size: 18px;'>{ticket_num}</strong>
-                                <span>{status_color} {status} {priority_badge}</span>
-                            </div>
-                            <div style='color: #888; margin-top: 5px;'>
-                                🏢 {customer}<br>
-                                👷 {driver}<br>
-                                📍 {from_loc} → {to_loc}<br>
-                                🛢️ {product}
-                            </div>
+                    cards.append(f"""
+                    <div style='background: #1E1E1E; padding: 15px; border-radius: 10px; margin-bottom: 10px; border-left: 4px solid {"#ff4444" if priority != "Normal" else "#4CAF50"};'>
+                        <div style='display: flex; justify-content: space-between;'>
+                            <strong style='font-size: 18px;'>{ticket_num}</strong>
+                            <span>{status_color} {status} {priority_badge}</span>
                         </div>
-                        """, unsafe_allow_html=True)
+                        <div style='color: #888; margin-top: 5px;'>
+                            🏢 {customer}<br>
+                            👷 {driver}<br>
+                            📍 {from_loc} → {to_loc}<br>
+                            🛢️ {product}
+                        </div>
+                    </div>
+                    """)
+                
+                # Render every card as one markdown element
+                st.markdown(''.join(cards), unsafe_allow_html=True)
         
         except Exception as e:
             st.error(f"❌ Error loading tickets: {e}")
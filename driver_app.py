@@ -5,9 +5,9 @@ Run with: streamlit run driver_app.py
 """
 
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
+from gspread.utils import rowcol_to_a1
 from datetime import datetime
+from auth import get_spreadsheet, get_worksheet
 
 # Page config
 st.set_page_config(
@@ -24,179 +24,134 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Google Auth
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-
-def get_client():
-    if hasattr(st, 'secrets') and 'gcp_service_account' in st.secrets:
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-    else:
-        creds = Credentials.from_service_account_file('service_account.json', scopes=SCOPES)
-    return gspread.authorize(creds)
-
+@st.cache_data(ttl=300)
 def load_drivers():
-    client = get_client()
-    sheet = client.open("Rick's TicketDrop 2.0").worksheet('SETTINGS')
-    data = sheet.get_all_values()
-    return [row[0] for row in data[1:] if row and row[0]]
+    sheet = get_worksheet('SETTINGS')
+    # Only the DRIVERS column is needed
+    values = sheet.get('A2:A')
+    return [row[0] for row in values if row and row[0]]
 
+@st.cache_data(ttl=15)
 def get_tickets(driver_name):
-    client = get_client()
-    sheet = client.open("Rick's TicketDrop 2.0").worksheet('ACTIVE TICKETS')
+    sheet = get_worksheet('ACTIVE TICKETS')
     records = sheet.get_all_records()
     return [t for t in records if t.get('DRIVER') == driver_name and t.get('STATUS') != 'COMPLETED']
 
-def update_cell(ticket_num, field, value):
-    """Update a single cell in ACTIVE TICKETS."""
-    client = get_client()
-    sheet = client.open("Rick's TicketDrop 2.0").worksheet('ACTIVE TICKETS')
-    data = sheet.get_all_values()
-    headers = data[0]
+@st.cache_data(ttl=600)
+def get_active_headers():
+    """Header row of ACTIVE TICKETS (rarely changes)."""
+    sheet = get_worksheet('ACTIVE TICKETS')
+    return sheet.row_values(1)
+
+@st.cache_data(ttl=600)
+def get_header_map():
+    """COMPLETED TICKETS headers and, for each, its ACTIVE TICKETS column index (-1 if absent)."""
+    active_headers = get_active_headers()
+    completed_headers = get_worksheet('COMPLETED TICKETS').row_values(1)
+    col_map = [active_headers.index(h) if h in active_headers else -1 for h in completed_headers]
+    return completed_headers, col_map
+
+def find_ticket_row(sheet, ticket_num):
+    """Locate a ticket's row number from the TICKET # column alone."""
+    ticket_numbers = sheet.col_values(1)
+    try:
+        return ticket_numbers.index(str(ticket_num), 1) + 1
+    except ValueError:
+        return None
+
+def update_fields(ticket_num, updates):
+    """Update several cells of one ticket in ACTIVE TICKETS with a single request."""
+    sheet = get_worksheet('ACTIVE TICKETS')
+    headers = get_active_headers()
     
     # Find row
-    row_num = None
-    for i, row in enumerate(data[1:], start=2):
-        if row[0] == ticket_num:
-            row_num = i
-            break
+    row_num = find_ticket_row(sheet, ticket_num)
     
     if not row_num:
         return False, "Ticket not found"
     
-    # Find column
-    if field not in headers:
-        return False, f"Column '{field}' not found in headers: {headers}"
-    
-    col_num = headers.index(field) + 1
+    # Find columns
+    missing = [field for field in updates if field not in headers]
+    if missing:
+        return False, f"Column '{missing[0]}' not found in headers: {headers}"
     
     # Update
-    sheet.update_cell(row_num, col_num, value)
+    sheet.batch_update([
+        {'range': rowcol_to_a1(row_num, headers.index(field) + 1), 'values': [[value]]}
+        for field, value in updates.items()
+    ], raw=False)
     return True, "Updated"
 
+@st.cache_data(ttl=5)
 def get_fresh_ticket(ticket_num):
     """Get fresh ticket data from Google Sheet."""
-    client = get_client()
-    sheet = client.open("Rick's TicketDrop 2.0").worksheet('ACTIVE TICKETS')
+    sheet = get_worksheet('ACTIVE TICKETS')
     records = sheet.get_all_records()
     for t in records:
         if str(t.get('TICKET #')) == str(ticket_num):
             return t
     return None
 
+def to_cell_data(value):
+    """Wrap a raw value as Sheets CellData, keeping numbers numeric."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return {'userEnteredValue': {'stringValue': str(value)}}
+    return {'userEnteredValue': {'numberValue': value}}
+
 def complete_ticket(ticket_num, form_data):
     """Move ticket to COMPLETED TICKETS."""
-    client = get_client()
-    spreadsheet = client.open("Rick's TicketDrop 2.0")
+    spreadsheet = get_spreadsheet()
     
-    active = spreadsheet.worksheet('ACTIVE TICKETS')
-    data = active.get_all_values()
-    headers = data[0]
+    active = get_worksheet('ACTIVE TICKETS')
+    completed = get_worksheet('COMPLETED TICKETS')
+    completed_headers, col_map = get_header_map()
     
     # Find ticket
-    row_num = None
-    row_data = None
-    for i, row in enumerate(data[1:], start=2):
-        if row[0] == ticket_num:
-            row_num = i
-            row_data = row
-            break
+    row_num = find_ticket_row(active, ticket_num)
     
     if not row_num:
         return False
     
-    # Create dict
-    ticket_dict = dict(zip(headers, row_data))
-    ticket_dict['STATUS'] = 'COMPLETED'
-    ticket_dict['COMPLETED AT'] = datetime.now().isoformat()
-    ticket_dict.update(form_data)
+    row_data = active.row_values(row_num)
     
-    # Add to COMPLETED
-    completed = spreadsheet.worksheet('COMPLETED TICKETS')
-    completed_headers = completed.row_values(1)
-    new_row = [ticket_dict.get(h, '') for h in completed_headers]
-    completed.append_row(new_row)
+    # Reorder into COMPLETED column order, then apply the completion fields
+    overrides = {'STATUS': 'COMPLETED', 'COMPLETED AT': datetime.now().isoformat(), **form_data}
+    new_row = [
+        overrides[h] if h in overrides else (row_data[i] if 0 <= i < len(row_data) else '')
+        for h, i in zip(completed_headers, col_map)
+    ]
     
-    # Delete from ACTIVE
-    active.delete_rows(row_num)
+    # Append to COMPLETED and delete from ACTIVE in one batchUpdate request
+    spreadsheet.batch_update({'requests': [
+        {'appendCells': {
+            'sheetId': completed.id,
+            'rows': [{'values': [to_cell_data(v) for v in new_row]}],
+            'fields': 'userEnteredValue',
+        }},
+        {'deleteDimension': {
+            'range': {'sheetId': active.id, 'dimension': 'ROWS', 'startIndex': row_num - 1, 'endIndex': row_num},
+        }},
+    ]})
     return True
 
-# ============================================================
-# SESSION STATE
-# ============================================================
-if 'driver' not in st.session_state:
-    st.session_state.driver = None
-if 'ticket_num' not in st.session_state:
-    st.session_state.ticket_num = None
-
-# ============================================================
-# LOGIN PAGE
-# ============================================================
-if not st.session_state.driver:
-    st.markdown("# 🚛 TicketDrop 2.0")
-    st.markdown("### Rick's Oilfield Hauling - Driver App")
-    st.markdown("---")
-    
-    drivers = load_drivers()
-    driver = st.selectbox("👷 Select Your Name", [''] + drivers)
-    
-    if st.button("🔓 LOG IN", type="primary"):
-        if driver:
-            st.session_state.driver = driver
-            st.rerun()
-        else:
-            st.error("Select your name")
-
-# ============================================================
-# TICKET LIST PAGE
-# ============================================================
-elif not st.session_state.ticket_num:
-    col1, col2 = st.columns([3,1])
-    with col1:
-        st.markdown(f"### 👷 {st.session_state.driver}")
-    with col2:
-        if st.button("🚪 Logout"):
-            st.session_state.driver = None
-            st.rerun()
-    
-    st.markdown("---")
-    
-    if st.button("🔄 Refresh Tickets"):
-        st.rerun()
-    
-    tickets = get_tickets(st.session_state.driver)
-    
-    if not tickets:
-        st.info("📭 No tickets assigned to you.")
-    else:
-        st.markdown(f"### 📋 Your Tickets ({len(tickets)})")
-        
-        for ticket in tickets:
-            ticket_num = ticket.get('TICKET #', '')
-            customer = ticket.get('CUSTOMER', '')
-            from_loc = ticket.get('FROM LSD', '')
-            to_loc = ticket.get('TO LSD', '')
-            product = ticket.get('PRODUCT', '')
-            priority = ticket.get('PRIORITY', 'Normal')
-            
-            st.markdown(f"""
-**{ticket_num}** {'🔴 HOT' if priority != 'Normal' else ''}  
-🏢 {customer}  
-📍 {from_loc} → {to_loc}  
-🛢️ {product}
-            """)
-            
-            if st.button(f"📂 Open Ticket {ticket_num}", key=f"open_{ticket_num}"):
-                st.session_state.ticket_num = str(ticket_num)
-                st.rerun()
-            
-            st.markdown("---")
+def timestamp_button(col, ticket_num, ticket, field, done_label, button_label, key, now_ts, extra=None, primary=False):
+    """Show a recorded timestamp, or a button that records now_ts (plus any extra fields)."""
+    with col:
+        value = ticket.get(field, '')
+        if value:
+            st.success(f"✅ {done_label}: {str(value)[:16]}")
+        elif st.button(button_label, key=key, type="primary" if primary else "secondary"):
+            success, msg = update_fields(ticket_num, {field: now_ts, **(extra or {})})
+            if success:
+                get_fresh_ticket.clear()
+                st.success("✅ Timestamp saved!")
+                st.rerun(scope="fragment")
+            else:
+                st.error(f"Error: {msg}")
 
-# ============================================================
-# TICKET DETAIL PAGE
-# ============================================================
-else:
-    ticket_num = st.session_state.ticket_num
+@st.fragment
+def ticket_detail(ticket_num):
+    """Ticket detail page; runs as a fragment so its widgets rerun only this page."""
     
     # Back button
     if st.button("← Back to Tickets"):
@@ -231,69 +186,14 @@ else:
     st.markdown("## ⏱️ Timestamps")
     
     col1, col2 = st.columns(2)
-    
-    # ARRIVE LOAD
-    with col1:
-        arrive_load = ticket.get('ARRIVE LOAD', '')
-        if arrive_load:
-            st.success(f"✅ Arrived Load: {str(arrive_load)[:16]}")
-        else:
-            if st.button("📍 ARRIVE AT LOAD", key="btn_arrive_load", type="primary"):
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                success, msg = update_cell(ticket_num, 'ARRIVE LOAD', timestamp)
-                if success:
-                    update_cell(ticket_num, 'STATUS', 'IN_PROGRESS')
-                    st.success("✅ Timestamp saved!")
-                    st.rerun()
-                else:
-                    st.error(f"Error: {msg}")
-    
-    # DEPART LOAD
-    with col2:
-        depart_load = ticket.get('DEPART LOAD', '')
-        if depart_load:
-            st.success(f"✅ Departed Load: {str(depart_load)[:16]}")
-        else:
-            if st.button("🚛 DEPART LOAD", key="btn_depart_load"):
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                success, msg = update_cell(ticket_num, 'DEPART LOAD', timestamp)
-                if success:
-                    st.success("✅ Timestamp saved!")
-                    st.rerun()
-                else:
-                    st.error(f"Error: {msg}")
-    
     col3, col4 = st.columns(2)
+    now_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    # ARRIVE OFFLOAD
-    with col3:
-        arrive_offload = ticket.get('ARRIVE OFFLOAD', '')
-        if arrive_offload:
-            st.success(f"✅ Arrived Offload: {str(arrive_offload)[:16]}")
-        else:
-            if st.button("📍 ARRIVE AT OFFLOAD", key="btn_arrive_offload"):
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                success, msg = update_cell(ticket_num, 'ARRIVE OFFLOAD', timestamp)
-                if success:
-                    st.success("✅ Timestamp saved!")
-                    st.rerun()
-                else:
-                    st.error(f"Error: {msg}")
-    
-    # DEPART OFFLOAD
-    with col4:
-        depart_offload = ticket.get('DEPART OFFLOAD', '')
-        if depart_offload:
-            st.success(f"✅ Departed Offload: {str(depart_offload)[:16]}")
-        else:
-            if st.button("🏁 DEPART OFFLOAD", key="btn_depart_offload"):
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                success, msg = update_cell(ticket_num, 'DEPART OFFLOAD', timestamp)
-                if success:
-                    st.success("✅ Timestamp saved!")
-                    st.rerun()
-                else:
-                    st.error(f"Error: {msg}")
+    timestamp_button(col1, ticket_num, ticket, 'ARRIVE LOAD', "Arrived Load", "📍 ARRIVE AT LOAD", "btn_arrive_load", now_ts,
+                     extra={'STATUS': 'IN_PROGRESS'}, primary=True)
+    timestamp_button(col2, ticket_num, ticket, 'DEPART LOAD', "Departed Load", "🚛 DEPART LOAD", "btn_depart_load", now_ts)
+    timestamp_button(col3, ticket_num, ticket, 'ARRIVE OFFLOAD', "Arrived Offload", "📍 ARRIVE AT OFFLOAD", "btn_arrive_offload", now_ts)
+    timestamp_button(col4, ticket_num, ticket, 'DEPART OFFLOAD', "Departed Offload", "🏁 DEPART OFFLOAD", "btn_depart_offload", now_ts)
     
     # ============================================================
     # COMPLETION FORM
@@ -318,13 +218,13 @@ else:
         st.markdown("---")
         st.markdown("### 👤 Consignor at LOAD Site")
         consignor_load = st.text_input("Consignor Name (person at pickup)", placeholder="Name of person at load site")
-        consignor_load_confirm = st.checkbox("Consignor confirmed loading ✓")
+        st.checkbox("Consignor confirmed loading ✓")
         
         # CONSIGNOR AT OFFLOAD
         st.markdown("---")
         st.markdown("### 👤 Consignor at OFFLOAD Site")
         consignor_offload = st.text_input("Consignor Name (person at delivery)", placeholder="Name of person at offload site")
-        consignor_offload_confirm = st.checkbox("Consignor confirmed offloading ✓")
+        st.checkbox("Consignor confirmed offloading ✓")
         
         # Placards
         st.markdown("---")
@@ -344,17 +244,17 @@ else:
         st.markdown("### ⚠️ Site Hazard Assessment")
         col1, col2, col3 = st.columns(3)
         with col1:
-            h1 = st.checkbox("Access")
-            h2 = st.checkbox("Weather")
-            h3 = st.checkbox("Wind Direction")
+            st.checkbox("Access")
+            st.checkbox("Weather")
+            st.checkbox("Wind Direction")
         with col2:
-            h4 = st.checkbox("Slip / Trip")
-            h5 = st.checkbox("Working Alone")
-            h6 = st.checkbox("Powerline")
+            st.checkbox("Slip / Trip")
+            st.checkbox("Working Alone")
+            st.checkbox("Powerline")
         with col3:
-            h7 = st.checkbox("PPE Used")
-            h8 = st.checkbox("Fire Extinguisher")
-            h9 = st.checkbox("Communication")
+            st.checkbox("PPE Used")
+            st.checkbox("Fire Extinguisher")
+            st.checkbox("Communication")
         
         # Notes
         st.markdown("---")
@@ -418,6 +318,8 @@ else:
                 }
                 
                 if complete_ticket(ticket_num, form_data):
+                    get_tickets.clear()
+                    get_fresh_ticket.clear()
                     st.success("🎉 Ticket completed!")
                     st.balloons()
                     st.session_state.ticket_num = None
@@ -425,6 +327,84 @@ else:
                 else:
                     st.error("Error completing ticket")
 
+# ============================================================
+# SESSION STATE
+# ============================================================
+if 'driver' not in st.session_state:
+    st.session_state.driver = None
+if 'ticket_num' not in st.session_state:
+    st.session_state.ticket_num = None
+
+# ============================================================
+# LOGIN PAGE
+# ============================================================
+if not st.session_state.driver:
+    st.markdown("# 🚛 TicketDrop 2.0")
+    st.markdown("### Rick's Oilfield Hauling - Driver App")
+    st.markdown("---")
+    
+    drivers = load_drivers()
+    driver = st.selectbox("👷 Select Your Name", [''] + drivers)
+    
+    if st.button("🔓 LOG IN", type="primary"):
+        if driver:
+            st.session_state.driver = driver
+            st.rerun()
+        else:
+            st.error("Select your name")
+
+# ============================================================
+# TICKET LIST PAGE
+# ============================================================
+elif not st.session_state.ticket_num:
+    col1, col2 = st.columns([3,1])
+    with col1:
+        st.markdown(f"### 👷 {st.session_state.driver}")
+    with col2:
+        if st.button("🚪 Logout"):
+            st.session_state.driver = None
+            st.rerun()
+    
+    st.markdown("---")
+    
+    if st.button("🔄 Refresh Tickets"):
+        get_tickets.clear()
+        st.rerun()
+    
+    tickets = get_tickets(st.session_state.driver)
+    
+    if not tickets:
+        st.info("📭 No tickets assigned to you.")
+    else:
+        st.markdown(f"### 📋 Your Tickets ({len(tickets)})")
+        
+        for ticket in tickets:
+            ticket_num = ticket.get('TICKET #', '')
+            customer = ticket.get('CUSTOMER', '')
+            from_loc = ticket.get('FROM LSD', '')
+            to_loc = ticket.get('TO LSD', '')
+            product = ticket.get('PRODUCT', '')
+            priority = ticket.get('PRIORITY', 'Normal')
+            
+            st.markdown(f"""
+**{ticket_num}** {'🔴 HOT' if priority != 'Normal' else ''}  
+🏢 {customer}  
+📍 {from_loc} → {to_loc}  
+🛢️ {product}
+            """)
+            
+            if st.button(f"📂 Open Ticket {ticket_num}", key=f"open_{ticket_num}"):
+                st.session_state.ticket_num = str(ticket_num)
+                st.rerun()
+            
+            st.markdown("---")
+
+# ============================================================
+# TICKET DETAIL PAGE
+# ============================================================
+else:
+    ticket_detail(st.session_state.ticket_num)
+
 # Footer
 st.markdown("---")
 st.markdown("<p style='text-align:center;color:#888;'>TicketDrop 2.0 | Rick's Oilfield Hauling</p>", unsafe_allow_html=True)
@@ -10,17 +10,25 @@ Usage:
     python3 axon_export.py --tickets "260101001,260101002"
 """
 
+from __future__ import annotations
+
 import os
 import sys
-import csv
+import json
 import argparse
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
-import gspread
-from google.oauth2.service_account import Credentials
-from dotenv import load_dotenv
+from functools import lru_cache
+from itertools import zip_longest
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
+from sheets_common import write_json_atomic
 
-load_dotenv()
+# gspread, google-auth, pandas and dotenv are imported where they are used so
+# that --help and argument errors return without paying their import time
+if TYPE_CHECKING:
+    import gspread
+    import pandas as pd
 
 # AXON B622 Column Order (CRITICAL - DO NOT CHANGE ORDER)
 AXON_COLUMNS = [
@@ -50,12 +58,32 @@ SCOPES = [
     "https://www.googleapis.com/auth/drive"
 ]
 
+# Ticket fields read by the export filters
+FILTER_COLUMNS = ['ticket_number', 'exported', 'customer', 'date', 'actual_volume', 'hours']
+
+# Every ticket field the exporter reads; only these columns are downloaded
+EXPORT_COLUMNS = FILTER_COLUMNS + ['from_lsd', 'to_lsd', 'product', 'truck', 'driver', 'trailer', 'arrive_load']
+
 SPREADSHEET_NAME = "Rick's TicketDrop 2.0"
 COMPLETED_SHEET = "COMPLETED TICKETS"
 
+# Local copy of the exporter's columns, reused while the spreadsheet is unmodified
+CACHE_FILE = os.path.join('.tmp', 'completed_cache.json')
+
+# Output buffer for the CSV file
+CSV_BUFFER_SIZE = 1 << 20
+
+# Held for the duration of an export; older than LOCK_STALE_SECONDS counts as abandoned
+LOCK_FILE = os.path.join('.tmp', 'axon_export.lock')
+LOCK_STALE_SECONDS = 5 * 60
+
 
 def get_credentials():
     """Load Google credentials from service account or OAuth."""
+    from dotenv import load_dotenv
+    from google.oauth2.service_account import Credentials
+    
+    load_dotenv()
     creds = None
     
     if os.path.exists('token.json'):
@@ -77,6 +105,13 @@ def get_credentials():
     return creds
 
 
+@lru_cache(maxsize=4)
+def get_completed_worksheet(client: gspread.Client) -> gspread.Worksheet:
+    """Open the COMPLETED TICKETS worksheet once per client and reuse the handle."""
+    return client.open(SPREADSHEET_NAME).worksheet(COMPLETED_SHEET)
+
+
+@lru_cache(maxsize=1024)
 def format_operator_name(driver_name: str) -> str:
     """Convert 'First Last' to 'Last, First' format."""
     parts = driver_name.strip().split()
@@ -85,6 +120,7 @@ def format_operator_name(driver_name: str) -> str:
     return driver_name
 
 
+@lru_cache(maxsize=1024)
 def format_start_date(timestamp: str) -> str:
     """Convert ISO timestamp to DD-MM-YYYY HH:MM format."""
     try:
@@ -94,6 +130,57 @@ def format_start_date(timestamp: str) -> str:
         return timestamp
 
 
+def fetch_completed_records(worksheet: gspread.Worksheet) -> Tuple[List[str], List[Dict]]:
+    """Read the header row, then only the EXPORT_COLUMNS data columns in one batch_get.
+    
+    Returns (headers, records); records[i] is sheet row i + 2 and holds the
+    EXPORT_COLUMNS present on the sheet, as formatted strings.
+    """
+    from gspread.utils import rowcol_to_a1
+    
+    headers = worksheet.row_values(1)
+    present = [c for c in EXPORT_COLUMNS if c in headers]
+    if not present:
+        return headers, []
+    
+    ranges = []
+    for name in present:
+        letter = rowcol_to_a1(1, headers.index(name) + 1)[:-1]
+        ranges.append(f"{letter}2:{letter}")
+    
+    columns = [[row[0] if row else '' for row in value_range] for value_range in worksheet.batch_get(ranges)]
+    records = [dict(zip(present, values)) for values in zip_longest(*columns, fillvalue='')]
+    return headers, records
+
+
+def load_completed_records(worksheet: gspread.Worksheet) -> Tuple[List[str], List[Dict]]:
+    """fetch_completed_records, served from CACHE_FILE while Drive's modifiedTime is unchanged."""
+    try:
+        modified = worksheet.spreadsheet.get_lastUpdateTime()
+    except Exception:
+        modified = None
+    key = [worksheet.spreadsheet_id, worksheet.id, modified, EXPORT_COLUMNS]
+    
+    if modified and os.path.exists(CACHE_FILE):
+        try:
+            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('key') == key:
+                return cached['headers'], cached['records']
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    headers, records = fetch_completed_records(worksheet)
+    
+    if modified:
+        try:
+            write_json_atomic(CACHE_FILE, {'key': key, 'headers': headers, 'records': records})
+        except OSError:
+            pass
+    
+    return headers, records
+
+
 def get_completed_tickets(
     client: gspread.Client,
     date_from: Optional[str] = None,
@@ -102,131 +189,167 @@ def get_completed_tickets(
     ticket_numbers: Optional[List[str]] = None,
     export_all: bool = False,
     force: bool = False
-) -> List[Dict]:
-    """Fetch completed tickets from Google Sheet with filters."""
+) -> Tuple[List[str], List[Dict], List[Dict]]:
+    """Fetch completed tickets from Google Sheet with filters.
+    
+    Returns (headers, all records, filtered tickets) so callers can reuse
+    the records instead of downloading the sheet again.
+    """
+    import gspread
+    import pandas as pd
     
     try:
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        worksheet = spreadsheet.worksheet(COMPLETED_SHEET)
+        worksheet = get_completed_worksheet(client)
     except gspread.SpreadsheetNotFound:
         print(f"Error: Spreadsheet '{SPREADSHEET_NAME}' not found", file=sys.stderr)
-        return []
+        return [], [], []
     except gspread.WorksheetNotFound:
         print(f"Error: Worksheet '{COMPLETED_SHEET}' not found", file=sys.stderr)
-        return []
+        return [], [], []
     
-    records = worksheet.get_all_records()
-    filtered = []
+    headers, records = load_completed_records(worksheet)
+    if not records:
+        return headers, records, []
     
-    for row in records:
-        # Skip if already exported (unless force)
-        if not force and row.get('exported', '').upper() == 'Y':
-            continue
-        
-        # Apply filters
-        if ticket_numbers and row.get('ticket_number') not in ticket_numbers:
-            continue
-        
-        if customer and row.get('customer', '').lower() != customer.lower():
-            continue
-        
-        if date_from:
-            ticket_date = row.get('date', '')
-            if ticket_date < date_from:
-                continue
-        
-        if date_to:
-            ticket_date = row.get('date', '')
-            if ticket_date > date_to:
-                continue
-        
-        # Validate required fields
-        if not row.get('actual_volume') or float(row.get('actual_volume', 0)) <= 0:
-            print(f"Warning: Skipping ticket {row.get('ticket_number')} - zero volume")
-            continue
-        
-        if not row.get('hours') or float(row.get('hours', 0)) <= 0:
-            print(f"Warning: Skipping ticket {row.get('ticket_number')} - zero hours")
-            continue
-        
-        filtered.append(row)
-    
-    return filtered
-
-
-def transform_to_axon(ticket: Dict) -> Dict:
-    """Transform ticket data to AXON B622 format."""
-    
-    from_lsd = ticket.get('from_lsd', '')
-    to_lsd = ticket.get('to_lsd', '')
-    product = ticket.get('product', '')
-    customer = ticket.get('customer', '')
-    
-    return {
-        'Attachment': 'FALSE',
-        'Customer': customer,
-        'Location': f"{from_lsd} to {to_lsd}",
-        'Start Date': format_start_date(ticket.get('arrive_load', '')),
-        'Reference': '',
-        'Ticket#': ticket.get('ticket_number', ''),
-        'Truck#': ticket.get('truck', ''),
-        'Operator': format_operator_name(ticket.get('driver', '')),
-        'Trailer#': ticket.get('trailer', ''),
-        'Product': product,
-        'Actual Vol': f"{float(ticket.get('actual_volume', 0)):.2f}",
-        'Product2': '',
-        'From LSD': from_lsd,
-        'To LSD': to_lsd,
-        'Hours': f"{float(ticket.get('hours', 0)):.2f}",
-        'Charge': '',
-        'Job Desc': f"{product} - {customer}",
-        'Company': "Rick's Oilfield Hauling",
-        'Status': 'Completed',
-    }
+    df = pd.DataFrame(records, dtype=object).reindex(columns=FILTER_COLUMNS).fillna('')
+    mask = pd.Series(True, index=df.index)
+    
+    # Skip if already exported (unless force)
+    if not force:
+        mask &= df['exported'].astype(str).str.upper().ne('Y')
+    
+    # Apply filters
+    if ticket_numbers:
+        mask &= df['ticket_number'].isin(ticket_numbers)
+    
+    if customer:
+        mask &= df['customer'].astype(str).str.lower().eq(customer.lower())
+    
+    if date_from:
+        mask &= df['date'].astype(str).ge(date_from)
+    
+    if date_to:
+        mask &= df['date'].astype(str).le(date_to)
+    
+    # Validate required fields
+    volume_ok = pd.to_numeric(df['actual_volume'], errors='coerce').gt(0)
+    hours_ok = pd.to_numeric(df['hours'], errors='coerce').gt(0)
+    
+    for ticket_number in df.loc[mask & ~volume_ok, 'ticket_number']:
+        print(f"Warning: Skipping ticket {ticket_number} - zero volume")
+    for ticket_number in df.loc[mask & volume_ok & ~hours_ok, 'ticket_number']:
+        print(f"Warning: Skipping ticket {ticket_number} - zero hours")
+    
+    mask &= volume_ok & hours_ok
+    filtered = [records[i] for i in mask.to_numpy().nonzero()[0]]
+    
+    return headers, records, filtered
+
+
+def build_axon_frame(tickets: List[Dict]) -> pd.DataFrame:
+    """Transform ticket data to AXON B622 format, one column at a time."""
+    import pandas as pd
+    
+    src = pd.DataFrame(tickets, dtype=object).reindex(columns=EXPORT_COLUMNS).fillna('')
+    text = src.astype(str)
+    
+    df = pd.DataFrame(index=src.index)
+    df['Attachment'] = 'FALSE'
+    df['Customer'] = src['customer']
+    df['Location'] = text['from_lsd'] + ' to ' + text['to_lsd']
+    df['Start Date'] = text['arrive_load'].map(format_start_date)
+    df['Reference'] = ''
+    df['Ticket#'] = src['ticket_number']
+    df['Truck#'] = src['truck']
+    df['Operator'] = text['driver'].map(format_operator_name)
+    df['Trailer#'] = src['trailer']
+    df['Product'] = src['product']
+    df['Actual Vol'] = pd.to_numeric(src['actual_volume']).fillna(0).map('{:.2f}'.format)
+    df['Product2'] = ''
+    df['From LSD'] = src['from_lsd']
+    df['To LSD'] = src['to_lsd']
+    df['Hours'] = pd.to_numeric(src['hours']).fillna(0).map('{:.2f}'.format)
+    df['Charge'] = ''
+    df['Job Desc'] = text['product'] + ' - ' + text['customer']
+    df['Company'] = "Rick's Oilfield Hauling"
+    df['Status'] = 'Completed'
+    
+    return df[AXON_COLUMNS]
 
 
 def export_to_csv(tickets: List[Dict], output_path: str) -> str:
     """Write tickets to CSV file in AXON format."""
     
-    with open(output_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=AXON_COLUMNS)
-        writer.writeheader()
-        
-        for ticket in tickets:
-            axon_row = transform_to_axon(ticket)
-            writer.writerow(axon_row)
+    # A 1 MiB buffer so large exports reach the disk in a few big writes
+    with open(output_path, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as f:
+        build_axon_frame(tickets).to_csv(f, index=False, lineterminator='\r\n')
     
     return output_path
 
 
-def mark_as_exported(client: gspread.Client, ticket_numbers: List[str], export_file: str):
-    """Update tickets as exported in Google Sheet."""
+def mark_as_exported(client: gspread.Client, ticket_numbers: List[str], export_file: str,
+                     headers: List[str], records: List[Dict]):
+    """Update tickets as exported in Google Sheet.
+    
+    `headers` and `records` are what get_completed_tickets already fetched;
+    record order gives the sheet row numbers.
+    """
+    from gspread.utils import rowcol_to_a1
+    
+    if not records:
+        return
     
     try:
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        worksheet = spreadsheet.worksheet(COMPLETED_SHEET)
+        worksheet = get_completed_worksheet(client)
     except Exception as e:
         print(f"Error marking exported: {e}", file=sys.stderr)
         return
     
-    records = worksheet.get_all_records()
-    headers = worksheet.row_values(1)
-    
     exported_col = headers.index('exported') + 1 if 'exported' in headers else None
     exported_at_col = headers.index('exported_at') + 1 if 'exported_at' in headers else None
     export_file_col = headers.index('export_file') + 1 if 'export_file' in headers else None
-    ticket_col = headers.index('ticket_number') + 1 if 'ticket_number' in headers else 1
     
     now = datetime.now().isoformat()
+    wanted = frozenset(ticket_numbers)
+    
+    # Sheet rows of the exported tickets, found in one pass over the fetched records
+    rows = [i for i, row in enumerate(records, start=2) if row.get('ticket_number') in wanted]  # Row 1 is the header
+    cells = [(col, value) for col, value in [(exported_col, 'Y'), (exported_at_col, now), (export_file_col, export_file)] if col]
+    
+    # Collect every cell change, then send them in one request
+    updates = [{'range': rowcol_to_a1(i, col), 'values': [[value]]} for i in rows for col, value in cells]
     
-    for i, row in enumerate(records, start=2):  # Start at row 2 (after header)
-        if row.get('ticket_number') in ticket_numbers:
-            if exported_col:
-                worksheet.update_cell(i, exported_col, 'Y')
-            if exported_at_col:
-                worksheet.update_cell(i, exported_at_col, now)
-            if export_file_col:
-                worksheet.update_cell(i, export_file_col, export_file)
+    if updates:
+        worksheet.batch_update(updates, value_input_option='USER_ENTERED')
+
+
+@contextmanager
+def export_lock():
+    """Advisory lock so two exports on this machine can't select and mark the same tickets."""
+    os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
+    
+    # A lock left behind by a crashed run expires
+    try:
+        if time.time() - os.path.getmtime(LOCK_FILE) > LOCK_STALE_SECONDS:
+            os.remove(LOCK_FILE)
+    except OSError:
+        pass
+    
+    try:
+        fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        print(f"Error: Another AXON export is already running (lock file: {LOCK_FILE})", file=sys.stderr)
+        sys.exit(1)
+    
+    try:
+        os.write(fd, f"{os.getpid()} {datetime.now().isoformat()}\n".encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(LOCK_FILE)
+        except OSError:
+            pass
 
 
 def main():
@@ -254,49 +377,52 @@ def main():
         print("Error: Could not load Google credentials", file=sys.stderr)
         sys.exit(1)
     
+    import gspread
     client = gspread.authorize(creds)
     
-    # Parse ticket numbers
-    ticket_numbers = None
-    if args.tickets:
-        ticket_numbers = [t.strip() for t in args.tickets.split(',')]
-    
-    # Fetch tickets
-    tickets = get_completed_tickets(
-        client,
-        date_from=args.date_from,
-        date_to=args.date_to,
-        customer=args.customer,
-        ticket_numbers=ticket_numbers,
-        export_all=args.export_all,
-        force=args.force
-    )
-    
-    if not tickets:
-        print("No tickets to export")
-        sys.exit(0)
-    
-    print(f"Found {len(tickets)} tickets to export")
-    
-    # Generate output filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = args.output or f".tmp/AXON_Export_{timestamp}.csv"
-    
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
-    
-    # Export to CSV
-    export_to_csv(tickets, output_file)
-    print(f"Exported to: {output_file}")
-    
-    # Mark as exported
-    if not args.no_mark:
-        exported_numbers = [t.get('ticket_number') for t in tickets]
-        mark_as_exported(client, exported_numbers, os.path.basename(output_file))
-        print(f"Marked {len(exported_numbers)} tickets as exported")
-    
-    print("\nExport complete!")
-    print(f"Copy to AXON import folder: C:\\AxonETAAttach\\{os.path.basename(output_file)}")
+    # One export at a time: selecting and marking tickets must not interleave
+    with export_lock():
+        # Parse ticket numbers
+        ticket_numbers = None
+        if args.tickets:
+            ticket_numbers = [t.strip() for t in args.tickets.split(',')]
+        
+        # Fetch tickets
+        headers, records, tickets = get_completed_tickets(
+            client,
+            date_from=args.date_from,
+            date_to=args.date_to,
+            customer=args.customer,
+            ticket_numbers=ticket_numbers,
+            export_all=args.export_all,
+            force=args.force
+        )
+        
+        if not tickets:
+            print("No tickets to export")
+            sys.exit(0)
+        
+        print(f"Found {len(tickets)} tickets to export")
+        
+        # Generate output filename
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = args.output or f".tmp/AXON_Export_{timestamp}.csv"
+        
+        # Ensure output directory exists
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        
+        # Export to CSV
+        export_to_csv(tickets, output_file)
+        print(f"Exported to: {output_file}")
+        
+        # Mark as exported only once the CSV is safely written
+        if not args.no_mark:
+            exported_numbers = [t.get('ticket_number') for t in tickets]
+            mark_as_exported(client, exported_numbers, os.path.basename(output_file), headers, records)
+            print(f"Marked {len(exported_numbers)} tickets as exported")
+        
+        print("\nExport complete!")
+        print(f"Copy to AXON import folder: C:\\AxonETAAttach\\{os.path.basename(output_file)}")
 
 
 if __name__ == "__main__":
@@ -14,10 +14,19 @@ import csv
 import json
 import argparse
 from datetime import datetime
-from typing import Dict, List, Optional
+from itertools import zip_longest
+from typing import Dict, FrozenSet, List, Optional, Tuple
 import gspread
 from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from sheets_common import get_worksheet, load_cached_token, read_cache, save_token, write_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks
+    fcntl = None
 
 load_dotenv()
 
@@ -31,6 +40,27 @@ DISPATCH_SHEET = "DISPATCH BOARD"
 ACTIVE_SHEET = "ACTIVE TICKETS"
 SETTINGS_SHEET = "SETTINGS"
 
+# CSV columns read by --batch; any other columns are ignored
+TICKET_FIELDS = frozenset([
+    'customer', 'from_lsd', 'to_lsd', 'product', 'driver', 'truck',
+    'trailer', 'est_volume', 'special_instructions', 'priority',
+])
+
+# Ticket fields checked against SETTINGS columns
+LOOKUP_FIELDS = [
+    ('customer', 'CUSTOMERS'),
+    ('driver', 'DRIVERS'),
+    ('product', 'PRODUCTS'),
+    ('truck', 'TRUCKS'),
+    ('trailer', 'TRAILERS'),
+]
+
+# Settings lists are cached on disk between runs (see sheets_common.read_cache)
+SETTINGS_CACHE_KEY = f"{SPREADSHEET_NAME}/{SETTINGS_SHEET}/settings"
+
+# Last ticket sequence handed out by this script, shared by concurrent runs
+COUNTER_FILE = os.path.join('.tmp', 'ticket_counter.json')
+
 
 def get_credentials():
     """Load Google credentials."""
@@ -49,17 +79,22 @@ def get_credentials():
     
     if not creds:
         service_account_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "service_account.json")
-        if os.path.exists(service_account_file):
+        creds = load_cached_token(service_account_file, SCOPES)
+        if not creds and os.path.exists(service_account_file):
             creds = Credentials.from_service_account_file(service_account_file, scopes=SCOPES)
+            save_token(creds, service_account_file, SCOPES)
     
     return creds
 
 
-def load_settings(client: gspread.Client) -> Dict[str, List[str]]:
-    """Load validation lists from SETTINGS sheet."""
+def load_settings(spreadsheet: gspread.Spreadsheet) -> Dict[str, FrozenSet[str]]:
+    """Load validation sets from SETTINGS sheet, cached on disk for CACHE_TTL_SECONDS."""
+    cached = read_cache(SETTINGS_CACHE_KEY)
+    if cached is not None:
+        return {header: frozenset(values) for header, values in cached.items()}
+    
     try:
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        worksheet = spreadsheet.worksheet(SETTINGS_SHEET)
+        worksheet = get_worksheet(spreadsheet, SETTINGS_SHEET)
         
         data = worksheet.get_all_values()
         if not data:
@@ -68,56 +103,85 @@ def load_settings(client: gspread.Client) -> Dict[str, List[str]]:
         settings = {}
         headers = data[0]
         
+        # Transpose once instead of re-indexing every row for every column
+        columns = list(zip_longest(*data[1:], fillvalue=''))
         for col_idx, header in enumerate(headers):
-            values = [row[col_idx] for row in data[1:] if len(row) > col_idx and row[col_idx]]
-            settings[header.upper()] = values
+            column = columns[col_idx] if col_idx < len(columns) else ()
+            settings[header.upper()] = [value for value in column if value]
         
-        return settings
+        write_cache(SETTINGS_CACHE_KEY, settings)
+        # validate_ticket only needs membership tests
+        return {header: frozenset(values) for header, values in settings.items()}
     
     except Exception as e:
         print(f"Warning: Could not load settings: {e}", file=sys.stderr)
         return {}
 
 
-def generate_ticket_number(client: gspread.Client) -> str:
-    """Generate next ticket number in YYMMDDXXX format."""
+def scan_ticket_sequence(spreadsheet: gspread.Spreadsheet, prefix: str) -> int:
+    """Highest sequence for today's prefix across DISPATCH, ACTIVE and COMPLETED."""
+    # Ticket# is column B of DISPATCH and column A of ACTIVE/COMPLETED; read
+    # just that column of each sheet in a single request
+    ranges = [f"'{DISPATCH_SHEET}'!B2:B", f"'{ACTIVE_SHEET}'!A2:A", "'COMPLETED TICKETS'!A2:A"]
+    value_ranges = spreadsheet.values_batch_get(ranges, params={'majorDimension': 'COLUMNS'}).get('valueRanges', [])
+    
+    sequences = [0]
+    for value_range in value_ranges:
+        for column in value_range.get('values', []):
+            for ticket_num in column:
+                if len(ticket_num) == 9 and ticket_num.startswith(prefix) and ticket_num[-3:].isdigit():
+                    sequences.append(int(ticket_num[-3:]))
+    
+    return max(sequences)
+
+
+def generate_ticket_number(spreadsheet: gspread.Spreadsheet, count: int = 1) -> str:
+    """Generate next ticket number in YYMMDDXXX format, reserving `count` numbers."""
     today = datetime.now()
     prefix = today.strftime("%y%m%d")
     
-    try:
-        spreadsheet = client.open(SPREADSHEET_NAME)
+    os.makedirs(os.path.dirname(COUNTER_FILE), exist_ok=True)
+    with open(COUNTER_FILE, 'a+', encoding='utf-8') as f:
+        # Hold the lock until the new sequence is written so that two runs
+        # never hand out the same numbers
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
         
-        # Check both DISPATCH and ACTIVE sheets for today's tickets
-        existing_numbers = []
+        f.seek(0)
+        try:
+            counter = json.load(f)
+        except ValueError:
+            counter = {}
         
-        for sheet_name in [DISPATCH_SHEET, ACTIVE_SHEET, "COMPLETED TICKETS"]:
-            try:
-                worksheet = spreadsheet.worksheet(sheet_name)
-                records = worksheet.get_all_records()
-                
-                for row in records:
-                    ticket_num = str(row.get('ticket_number', ''))
-                    if ticket_num.startswith(prefix):
-                        existing_numbers.append(ticket_num)
-            except:
-                continue
+        try:
+            # The dispatch app also issues numbers, so the sheets stay the
+            # source of truth; the counter covers runs the sheet scan can't see yet
+            last = scan_ticket_sequence(spreadsheet, prefix)
+        except Exception as e:
+            print(f"Warning: Could not check existing tickets: {e}", file=sys.stderr)
+            last = 0
         
-        # Find next sequence number
-        if not existing_numbers:
-            sequence = 1
-        else:
-            sequences = [int(num[-3:]) for num in existing_numbers if len(num) == 9]
-            sequence = max(sequences) + 1 if sequences else 1
+        if counter.get('date') == prefix:
+            last = max(last, counter.get('seq', 0))
         
-        return f"{prefix}{sequence:03d}"
+        f.seek(0)
+        f.truncate()
+        json.dump({'date': prefix, 'seq': last + count}, f)
     
-    except Exception as e:
-        print(f"Warning: Could not check existing tickets: {e}", file=sys.stderr)
-        return f"{prefix}001"
+    return f"{prefix}{last + 1:03d}"
+
 
+def find_unknown_values(tickets: List[Dict], settings: Dict) -> Dict[str, set]:
+    """Values of each lookup field missing from SETTINGS, checking each distinct value once."""
+    unknown = {}
+    for field, setting in LOOKUP_FIELDS:
+        if settings.get(setting):
+            unknown[field] = {ticket[field] for ticket in tickets if ticket.get(field)} - settings[setting]
+    return unknown
 
-def validate_ticket(ticket_data: Dict, settings: Dict) -> List[str]:
-    """Validate ticket data against settings."""
+
+def validate_ticket(ticket_data: Dict, settings: Dict, unknown: Optional[Dict[str, set]] = None) -> List[str]:
+    """Validate ticket data against settings (pass `unknown` from find_unknown_values for batches)."""
     errors = []
     
     # Required fields
@@ -127,30 +191,36 @@ def validate_ticket(ticket_data: Dict, settings: Dict) -> List[str]:
             errors.append(f"Missing required field: {field}")
     
     # Validate against settings lists
-    if settings.get('CUSTOMERS'):
-        if ticket_data.get('customer') and ticket_data['customer'] not in settings['CUSTOMERS']:
-            errors.append(f"Unknown customer: {ticket_data['customer']}")
-    
-    if settings.get('DRIVERS'):
-        if ticket_data.get('driver') and ticket_data['driver'] not in settings['DRIVERS']:
-            errors.append(f"Unknown driver: {ticket_data['driver']}")
+    if unknown is None:
+        unknown = find_unknown_values([ticket_data], settings)
     
-    if settings.get('PRODUCTS'):
-        if ticket_data.get('product') and ticket_data['product'] not in settings['PRODUCTS']:
-            errors.append(f"Unknown product: {ticket_data['product']}")
-    
-    if settings.get('TRUCKS'):
-        if ticket_data.get('truck') and ticket_data['truck'] not in settings['TRUCKS']:
-            errors.append(f"Unknown truck: {ticket_data['truck']}")
-    
-    if settings.get('TRAILERS'):
-        if ticket_data.get('trailer') and ticket_data['trailer'] not in settings['TRAILERS']:
-            errors.append(f"Unknown trailer: {ticket_data['trailer']}")
+    for field, _ in LOOKUP_FIELDS:
+        if ticket_data.get(field) and ticket_data[field] in unknown.get(field, ()):
+            errors.append(f"Unknown {field}: {ticket_data[field]}")
     
     return errors
 
 
-def create_ticket(client: gspread.Client, ticket_data: Dict, settings: Dict) -> Dict:
+def build_dispatch_row(ticket_number: str, ticket_data: Dict, now: datetime) -> List[str]:
+    """Build a DISPATCH BOARD row for a ticket."""
+    return [
+        "",  # A: Create checkbox (empty)
+        ticket_number,  # B: Ticket#
+        now.strftime("%Y-%m-%d"),  # C: Date
+        ticket_data.get('customer', ''),  # D: Customer
+        ticket_data.get('from_lsd', ''),  # E: From LSD
+        ticket_data.get('to_lsd', ''),  # F: To LSD
+        ticket_data.get('product', ''),  # G: Product
+        ticket_data.get('driver', ''),  # H: Driver
+        ticket_data.get('truck', ''),  # I: Truck
+        ticket_data.get('trailer', ''),  # J: Trailer
+        ticket_data.get('est_volume', ''),  # K: Est Vol
+        ticket_data.get('special_instructions', ''),  # L: Instructions
+        ticket_data.get('priority', 'Normal'),  # M: Priority
+    ]
+
+
+def create_ticket(spreadsheet: gspread.Spreadsheet, ticket_data: Dict, settings: Dict) -> Dict:
     """Create a new ticket in the DISPATCH BOARD."""
     
     # Validate
@@ -159,29 +229,13 @@ def create_ticket(client: gspread.Client, ticket_data: Dict, settings: Dict) ->
         return {"success": False, "errors": errors}
     
     # Generate ticket number
-    ticket_number = generate_ticket_number(client)
+    ticket_number = generate_ticket_number(spreadsheet)
     
     try:
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        worksheet = spreadsheet.worksheet(DISPATCH_SHEET)
+        worksheet = get_worksheet(spreadsheet, DISPATCH_SHEET)
         
         # Prepare row data
-        now = datetime.now()
-        row = [
-            "",  # A: Create checkbox (empty)
-            ticket_number,  # B: Ticket#
-            now.strftime("%Y-%m-%d"),  # C: Date
-            ticket_data.get('customer', ''),  # D: Customer
-            ticket_data.get('from_lsd', ''),  # E: From LSD
-            ticket_data.get('to_lsd', ''),  # F: To LSD
-            ticket_data.get('product', ''),  # G: Product
-            ticket_data.get('driver', ''),  # H: Driver
-            ticket_data.get('truck', ''),  # I: Truck
-            ticket_data.get('trailer', ''),  # J: Trailer
-            ticket_data.get('est_volume', ''),  # K: Est Vol
-            ticket_data.get('special_instructions', ''),  # L: Instructions
-            ticket_data.get('priority', 'Normal'),  # M: Priority
-        ]
+        row = build_dispatch_row(ticket_number, ticket_data, datetime.now())
         
         # Append row
         worksheet.append_row(row, value_input_option='USER_ENTERED')
@@ -196,24 +250,53 @@ def create_ticket(client: gspread.Client, ticket_data: Dict, settings: Dict) ->
         return {"success": False, "errors": [str(e)]}
 
 
-def create_tickets_batch(client: gspread.Client, csv_file: str, settings: Dict) -> Dict:
-    """Create multiple tickets from CSV file."""
+def read_tickets_csv(csv_file: str) -> List[Dict]:
+    """Read ticket rows from a CSV file, keeping only the TICKET_FIELDS columns."""
+    with open(csv_file, 'r') as f:
+        reader = csv.reader(f)
+        
+        # Resolve the ticket fields to column positions once from the header
+        header = next(reader, [])
+        positions = [(name, i) for i, name in enumerate(header) if name in TICKET_FIELDS]
+        
+        return [{name: values[i] for name, i in positions if i < len(values)}
+                for values in reader if values]
+
+
+def validate_tickets(tickets: List[Dict], settings: Dict) -> Tuple[List[Dict], List[Dict]]:
+    """Split tickets into valid ones and {"data", "errors"} failures."""
+    # Check each distinct customer/driver/product/truck/trailer once
+    unknown = find_unknown_values(tickets, settings)
+    
+    valid, failed = [], []
+    for row in tickets:
+        errors = validate_ticket(row, settings, unknown)
+        if errors:
+            failed.append({"data": row, "errors": errors})
+        else:
+            valid.append(row)
+    
+    return valid, failed
+
+
+def create_tickets_batch(spreadsheet: gspread.Spreadsheet, csv_file: str, settings: Dict) -> Dict:
+    """Create multiple tickets from CSV file with a single append_rows call."""
     results = {"created": [], "failed": []}
     
     try:
-        with open(csv_file, 'r') as f:
-            reader = csv.DictReader(f)
+        valid, results['failed'] = validate_tickets(read_tickets_csv(csv_file), settings)
+        
+        if valid:
+            # Reserve the whole batch at once and number it locally
+            first = generate_ticket_number(spreadsheet, len(valid))
+            prefix, sequence = first[:6], int(first[6:])
+            ticket_numbers = [f"{prefix}{sequence + i:03d}" for i in range(len(valid))]
+            
+            now = datetime.now()
+            rows = [build_dispatch_row(number, data, now) for number, data in zip(ticket_numbers, valid)]
             
-            for row in reader:
-                result = create_ticket(client, row, settings)
-                
-                if result.get('success'):
-                    results['created'].append(result['ticket_number'])
-                else:
-                    results['failed'].append({
-                        "data": row,
-                        "errors": result.get('errors', [])
-                    })
+            get_worksheet(spreadsheet, DISPATCH_SHEET).append_rows(rows, value_input_option='USER_ENTERED')
+            results['created'].extend(ticket_numbers)
     
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -246,23 +329,77 @@ def main():
     
     # Output
     parser.add_argument("--json", action="store_true", help="Output JSON")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only validate; uses the cached SETTINGS snapshot when there is one")
     
     args = parser.parse_args()
     
-    # Authenticate
-    creds = get_credentials()
-    if not creds:
-        print("Error: Could not load Google credentials", file=sys.stderr)
+    if not args.batch and not args.customer:
+        print("Error: --customer required for single ticket creation", file=sys.stderr)
+        parser.print_help()
         sys.exit(1)
     
-    client = gspread.authorize(creds)
+    # A dry run validates against the last SETTINGS snapshot, however old,
+    # and only goes to the API when no snapshot exists yet
+    settings = None
+    if args.dry_run:
+        cached = read_cache(SETTINGS_CACHE_KEY, max_age=None)
+        if cached is not None:
+            settings = {header: frozenset(values) for header, values in cached.items()}
     
-    # Load settings
-    settings = load_settings(client)
+    if settings is None:
+        # Authenticate
+        creds = get_credentials()
+        if not creds:
+            print("Error: Could not load Google credentials", file=sys.stderr)
+            sys.exit(1)
+        
+        client = gspread.authorize(creds)
+        # Back off and retry when Sheets rate-limits (429) or is briefly unavailable
+        # (503); neither applies the request, so retrying writes cannot duplicate rows
+        retry = Retry(total=6, backoff_factor=1, status_forcelist=[429, 503],
+                      allowed_methods=frozenset(['GET', 'POST', 'PUT']), raise_on_status=False)
+        client.http_client.session.mount('https://', HTTPAdapter(max_retries=retry))
+        
+        # Open the spreadsheet once and share it with every step
+        try:
+            spreadsheet = client.open(SPREADSHEET_NAME)
+        except Exception as e:
+            print(f"Error: Could not open {SPREADSHEET_NAME}: {e}", file=sys.stderr)
+            sys.exit(1)
+        
+        # Load settings
+        settings = load_settings(spreadsheet)
     
-    if args.batch:
+    if args.dry_run and args.batch:
+        # Validate the CSV without creating anything
+        try:
+            valid, failed = validate_tickets(read_tickets_csv(args.batch), settings)
+        except OSError as e:
+            print(f"Error: Could not read {args.batch}: {e}", file=sys.stderr)
+            sys.exit(1)
+        
+        if args.json:
+            print(json.dumps({
+                "success": not failed,
+                "valid_count": len(valid),
+                "failed_count": len(failed),
+                "results": {"failed": failed}
+            }, indent=2))
+        else:
+            print(f"Valid: {len(valid)}")
+            print(f"Failed: {len(failed)}")
+            
+            if failed:
+                print("\nFailed tickets:")
+                for fail in failed:
+                    print(f"  - {fail['data']}: {fail['errors']}")
+        
+        if failed:
+            sys.exit(1)
+    elif args.batch:
         # Batch mode
-        result = create_tickets_batch(client, args.batch, settings)
+        result = create_tickets_batch(spreadsheet, args.batch, settings)
         
         if args.json:
             print(json.dumps(result, indent=2))
@@ -276,11 +413,6 @@ def main():
                     print(f"  - {fail['data']}: {fail['errors']}")
     else:
         # Single ticket mode
-        if not args.customer:
-            print("Error: --customer required for single ticket creation", file=sys.stderr)
-            parser.print_help()
-            sys.exit(1)
-        
         ticket_data = {
             'customer': args.customer,
             'from_lsd': args.from_lsd,
@@ -294,7 +426,23 @@ def main():
             'priority': args.priority,
         }
         
-        result = create_ticket(client, ticket_data, settings)
+        if args.dry_run:
+            errors = validate_ticket(ticket_data, settings)
+            
+            if args.json:
+                print(json.dumps({"success": not errors, "errors": errors}, indent=2))
+            elif errors:
+                print("✗ Ticket is not valid:")
+                for error in errors:
+                    print(f"  - {error}")
+            else:
+                print("✓ Ticket is valid")
+            
+            if errors:
+                sys.exit(1)
+            return
+        
+        result = create_ticket(spreadsheet, ticket_data, settings)
         
         if args.json:
             print(json.dumps(result, indent=2))
@@ -0,0 +1,131 @@
+"""
+Helpers shared by the execution scripts: the on-disk sheet cache, the
+service-account access-token cache under .tmp/, and worksheet lookup.
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+# gspread is imported where it is used so validate_ticket.py keeps its fast --help
+if TYPE_CHECKING:
+    import gspread
+
+# Header rows and settings lists are cached on disk between runs
+CACHE_FILE = os.path.join('.tmp', 'sheet_cache.json')
+CACHE_TTL_SECONDS = 300
+
+# Service-account access tokens are reused until shortly before they expire
+TOKEN_CACHE_FILE = os.path.join('.tmp', 'token_cache.json')
+TOKEN_EXPIRY_MARGIN = 60
+
+# Worksheets by title for each spreadsheet id, filled by one metadata read per run
+_worksheets: Dict[str, Dict[str, gspread.Worksheet]] = {}
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """Write JSON to a temp file and rename it over path, so readers never see a partial file.
+    
+    The temp file is created 0600, so the token cache stays private.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_cache(key: str, max_age: Optional[float] = CACHE_TTL_SECONDS) -> Optional[Any]:
+    """Return a cached value from CACHE_FILE if it is younger than max_age (None: any age)."""
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            entry = json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+    
+    if not entry or (max_age is not None and time.time() - entry.get('time', 0) > max_age):
+        return None
+    return entry.get('value')
+
+
+def write_cache(key: str, value: Any) -> None:
+    """Store a value in CACHE_FILE; failures only cost a re-read next run."""
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    
+    cache[key] = {'time': time.time(), 'value': value}
+    
+    try:
+        write_json_atomic(CACHE_FILE, cache)
+    except OSError:
+        pass
+
+
+def load_cached_token(service_account_file: str, scopes: List[str]):
+    """Reuse a service-account access token minted by an earlier run, if still valid."""
+    from google.oauth2.credentials import Credentials as UserCredentials
+    
+    try:
+        with open(TOKEN_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        expiry = datetime.fromisoformat(cached['expiry'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    
+    if cached.get('account') != service_account_file or cached.get('scopes') != scopes:
+        return None
+    # google-auth keeps expiry as naive UTC
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if now >= expiry - timedelta(seconds=TOKEN_EXPIRY_MARGIN):
+        return None
+    return UserCredentials(token=cached['token'], expiry=expiry, scopes=scopes)
+
+
+def save_token(creds, service_account_file: str, scopes: List[str]) -> None:
+    """Mint an access token now and cache it so the next run skips JWT signing."""
+    from google.auth.transport.requests import Request
+    
+    try:
+        creds.refresh(Request())
+        write_json_atomic(TOKEN_CACHE_FILE, {
+            'account': service_account_file,
+            'scopes': scopes,
+            'token': creds.token,
+            'expiry': creds.expiry.isoformat(),
+        })
+    except Exception:
+        # gspread refreshes the credentials itself if this didn't work
+        pass
+
+
+def get_worksheets(spreadsheet: gspread.Spreadsheet) -> Dict[str, gspread.Worksheet]:
+    """Every worksheet in the spreadsheet by title, from one metadata read."""
+    if spreadsheet.id not in _worksheets:
+        _worksheets[spreadsheet.id] = {worksheet.title: worksheet for worksheet in spreadsheet.worksheets()}
+    return _worksheets[spreadsheet.id]
+
+
+def get_worksheet(spreadsheet: gspread.Spreadsheet, title: str) -> gspread.Worksheet:
+    """Look up a worksheet without re-fetching spreadsheet metadata."""
+    import gspread
+    
+    try:
+        return get_worksheets(spreadsheet)[title]
+    except KeyError:
+        raise gspread.WorksheetNotFound(title)
@@ -13,10 +13,14 @@ import sys
 import json
 import argparse
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import gspread
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from sheets_common import get_worksheet, load_cached_token, read_cache, save_token, write_cache
 
 load_dotenv()
 
@@ -47,39 +51,59 @@ def get_credentials():
     
     if not creds:
         service_account_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "service_account.json")
-        if os.path.exists(service_account_file):
+        creds = load_cached_token(service_account_file, SCOPES)
+        if not creds and os.path.exists(service_account_file):
             creds = Credentials.from_service_account_file(service_account_file, scopes=SCOPES)
+            save_token(creds, service_account_file, SCOPES)
     
     return creds
 
 
-def find_ticket_row(worksheet: gspread.Worksheet, ticket_number: str) -> Optional[int]:
+def get_headers(worksheet: gspread.Worksheet, refresh: bool = False) -> List[str]:
+    """Header row of a worksheet, cached on disk for CACHE_TTL_SECONDS."""
+    key = f"{worksheet.spreadsheet.id}/{worksheet.title}/headers"
+    
+    headers = None if refresh else read_cache(key)
+    if headers is None:
+        headers = worksheet.row_values(1)
+        write_cache(key, headers)
+    return headers
+
+
+def find_ticket_row(worksheet: gspread.Worksheet, ticket_number: str,
+                    headers: Optional[List[str]] = None) -> Optional[int]:
     """Find the row number for a ticket."""
-    records = worksheet.get_all_records()
-    headers = worksheet.row_values(1)
+    if headers is None:
+        headers = get_headers(worksheet)
     
     ticket_col = 'ticket_number' if 'ticket_number' in headers else 'Ticket#'
+    if ticket_col not in headers:
+        return None
     
-    for i, row in enumerate(records, start=2):  # Row 2 is first data row
-        if str(row.get(ticket_col, row.get('ticket_number', ''))) == str(ticket_number):
+    # Only download the ticket number column, not the whole sheet
+    ticket_numbers = worksheet.col_values(headers.index(ticket_col) + 1)
+    
+    for i, value in enumerate(ticket_numbers[1:], start=2):  # Row 2 is first data row
+        if value == str(ticket_number):
             return i
     
     return None
 
 
-def update_field(client: gspread.Client, ticket_number: str, field: str, value: str) -> Dict:
+def update_field(spreadsheet: gspread.Spreadsheet, ticket_number: str, field: str, value: str) -> Dict:
     """Update a single field on a ticket."""
     try:
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        worksheet = spreadsheet.worksheet(ACTIVE_SHEET)
+        worksheet = get_worksheet(spreadsheet, ACTIVE_SHEET)
+        
+        # Read headers once for both the row lookup and the column lookup
+        headers = get_headers(worksheet)
         
         # Find ticket row
-        row_num = find_ticket_row(worksheet, ticket_number)
+        row_num = find_ticket_row(worksheet, ticket_number, headers)
         if not row_num:
             return {"success": False, "error": f"Ticket {ticket_number} not found"}
         
         # Find column
-        headers = worksheet.row_values(1)
         if field not in headers:
             # Try alternate names
             field_map = {
@@ -91,24 +115,31 @@ def update_field(client: gspread.Client, ticket_number: str, field: str, value:
             }
             field = field_map.get(field, field)
         
+        if field not in headers:
+            # The cached header row may be stale; check the sheet itself
+            headers = get_headers(worksheet, refresh=True)
+        
         if field not in headers:
             return {"success": False, "error": f"Field '{field}' not found in sheet"}
         
         col_num = headers.index(field) + 1
         
         # Update cell
-        worksheet.update_cell(row_num, col_num, value)
+        cells = [{'range': rowcol_to_a1(row_num, col_num), 'values': [[value]]}]
         
         # Update timestamp
         if 'updated_at' in headers or 'Updated At' in headers:
             update_col = headers.index('updated_at' if 'updated_at' in headers else 'Updated At') + 1
-            worksheet.update_cell(row_num, update_col, datetime.now().isoformat())
+            cells.append({'range': rowcol_to_a1(row_num, update_col), 'values': [[datetime.now().isoformat()]]})
         
         # Update status if first timestamp
         if field in ['arrive_load', 'Arrive Load']:
             if 'status' in headers or 'Status' in headers:
                 status_col = headers.index('status' if 'status' in headers else 'Status') + 1
-                worksheet.update_cell(row_num, status_col, 'IN_PROGRESS')
+                cells.append({'range': rowcol_to_a1(row_num, status_col), 'values': [['IN_PROGRESS']]})
+        
+        # Write every cell in a single request
+        worksheet.batch_update(cells, value_input_option='USER_ENTERED')
         
         return {
             "success": True,
@@ -121,53 +152,84 @@ def update_field(client: gspread.Client, ticket_number: str, field: str, value:
         return {"success": False, "error": str(e)}
 
 
-def calculate_hours(data: Dict) -> float:
-    """Calculate total hours from timestamps."""
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """Parse an ISO timestamp (trailing 'Z' allowed), or None if it isn't one."""
     try:
-        arrive = datetime.fromisoformat(data.get('arrive_load', '').replace('Z', '+00:00'))
-        depart = datetime.fromisoformat(data.get('depart_offload', '').replace('Z', '+00:00'))
-        delta = depart - arrive
+        return datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def parse_timestamps(data: Dict) -> Dict[str, Optional[datetime]]:
+    """Parse each of the four driver timestamps once."""
+    return {field: parse_timestamp(data.get(field, ''))
+            for field in ('arrive_load', 'depart_load', 'arrive_offload', 'depart_offload')}
+
+
+def calculate_hours(times: Dict[str, Optional[datetime]]) -> float:
+    """Calculate total hours from parsed timestamps."""
+    try:
+        delta = times['depart_offload'] - times['arrive_load']
         return round(delta.total_seconds() / 3600, 2)
-    except:
+    except TypeError:
         return 0.0
 
 
-def calculate_wait_time(data: Dict) -> float:
-    """Calculate wait time from timestamps."""
+def calculate_wait_time(times: Dict[str, Optional[datetime]]) -> float:
+    """Calculate wait time from parsed timestamps."""
     try:
-        arrive1 = datetime.fromisoformat(data.get('arrive_load', '').replace('Z', '+00:00'))
-        depart1 = datetime.fromisoformat(data.get('depart_load', '').replace('Z', '+00:00'))
-        arrive2 = datetime.fromisoformat(data.get('arrive_offload', '').replace('Z', '+00:00'))
-        depart2 = datetime.fromisoformat(data.get('depart_offload', '').replace('Z', '+00:00'))
-        
-        wait1 = (depart1 - arrive1).total_seconds() / 3600
-        wait2 = (depart2 - arrive2).total_seconds() / 3600
-        
-        return round(wait1 + wait2, 2)
-    except:
+        wait = (times['depart_load'] - times['arrive_load']) + (times['depart_offload'] - times['arrive_offload'])
+        return round(wait.total_seconds() / 3600, 2)
+    except TypeError:
         return 0.0
 
 
-def complete_ticket(client: gspread.Client, ticket_number: str, data: Dict) -> Dict:
+def to_cell_data(value) -> Dict:
+    """Wrap a value as Sheets CellData, keeping its type.
+    
+    The ticket row is read unformatted, so numbers, booleans and date serials
+    arrive typed and pass straight through; None and '' leave the cell empty.
+    """
+    if value is None or value == '':
+        return {}
+    if isinstance(value, bool):
+        return {'userEnteredValue': {'boolValue': value}}
+    if isinstance(value, (int, float)):
+        return {'userEnteredValue': {'numberValue': value}}
+    return {'userEnteredValue': {'stringValue': str(value)}}
+
+
+def complete_ticket(spreadsheet: gspread.Spreadsheet, ticket_number: str, data: Dict) -> Dict:
     """Complete a ticket and move to COMPLETED TICKETS."""
     try:
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        active_ws = spreadsheet.worksheet(ACTIVE_SHEET)
-        completed_ws = spreadsheet.worksheet(COMPLETED_SHEET)
+        active_ws = get_worksheet(spreadsheet, ACTIVE_SHEET)
+        completed_ws = get_worksheet(spreadsheet, COMPLETED_SHEET)
         
         # Find ticket row
-        row_num = find_ticket_row(active_ws, ticket_number)
+        row_num = find_ticket_row(active_ws, ticket_number, get_headers(active_ws))
         if not row_num:
             return {"success": False, "error": f"Ticket {ticket_number} not found"}
         
-        # Get current row data
-        row_values = active_ws.row_values(row_num)
-        headers = active_ws.row_values(1)
+        # Read both header rows and the ticket row in a single request; the
+        # headers are read fresh so the row can't be zipped against a stale cache.
+        # Unformatted values keep numbers, booleans and dates typed for the append
+        value_ranges = spreadsheet.values_batch_get([
+            f"'{ACTIVE_SHEET}'!1:1",
+            f"'{ACTIVE_SHEET}'!{row_num}:{row_num}",
+            f"'{COMPLETED_SHEET}'!1:1",
+        ], params={'valueRenderOption': 'UNFORMATTED_VALUE', 'dateTimeRenderOption': 'SERIAL_NUMBER'}).get('valueRanges', [])
+        headers, row_values, completed_headers = [
+            (value_range.get('values') or [[]])[0] for value_range in value_ranges
+        ]
+        write_cache(f"{spreadsheet.id}/{ACTIVE_SHEET}/headers", headers)
+        write_cache(f"{spreadsheet.id}/{COMPLETED_SHEET}/headers", completed_headers)
+        
         ticket_data = dict(zip(headers, row_values))
         
         # Calculate derived fields
-        data['hours'] = data.get('hours') or calculate_hours(data)
-        data['wait_time'] = data.get('wait_time') or calculate_wait_time(data)
+        times = parse_timestamps(data)
+        data['hours'] = data.get('hours') or calculate_hours(times)
+        data['wait_time'] = data.get('wait_time') or calculate_wait_time(times)
         data['status'] = 'COMPLETED'
         data['completed_at'] = datetime.now().isoformat()
         
@@ -176,14 +238,21 @@ def complete_ticket(client: gspread.Client, ticket_number: str, data: Dict) -> D
             ticket_data[key] = value
         
         # Prepare row for completed sheet
-        completed_headers = completed_ws.row_values(1)
         completed_row = [ticket_data.get(h, '') for h in completed_headers]
         
-        # Append to COMPLETED TICKETS
-        completed_ws.append_row(completed_row, value_input_option='USER_ENTERED')
-        
-        # Delete from ACTIVE TICKETS
-        active_ws.delete_rows(row_num)
+        # Append to COMPLETED TICKETS and delete from ACTIVE TICKETS in one
+        # batchUpdate request, so a ticket is never in both sheets or neither
+        spreadsheet.batch_update({'requests': [
+            {'appendCells': {
+                'sheetId': completed_ws.id,
+                'rows': [{'values': [to_cell_data(v) for v in completed_row]}],
+                # Values only, so date serials pick up the COMPLETED columns' formats
+                'fields': 'userEnteredValue',
+            }},
+            {'deleteDimension': {
+                'range': {'sheetId': active_ws.id, 'dimension': 'ROWS', 'startIndex': row_num - 1, 'endIndex': row_num},
+            }},
+        ]})
         
         return {
             "success": True,
@@ -215,18 +284,29 @@ def main():
         sys.exit(1)
     
     client = gspread.authorize(creds)
+    # Back off and retry when Sheets rate-limits (429) or is briefly unavailable
+    # (503); neither applies the request, so retrying writes cannot duplicate rows
+    retry = Retry(total=6, backoff_factor=1, status_forcelist=[429, 503],
+                  allowed_methods=frozenset(['GET', 'POST', 'PUT']), raise_on_status=False)
+    client.http_client.session.mount('https://', HTTPAdapter(max_retries=retry))
+    
+    try:
+        spreadsheet = client.open(SPREADSHEET_NAME)
+    except Exception as e:
+        print(f"Error: Could not open {SPREADSHEET_NAME}: {e}", file=sys.stderr)
+        sys.exit(1)
     
     if args.complete:
         # Complete ticket
         data = json.loads(args.data) if args.data else {}
-        result = complete_ticket(client, args.ticket, data)
+        result = complete_ticket(spreadsheet, args.ticket, data)
     else:
         # Update single field
         if not args.field or not args.value:
             print("Error: --field and --value required for update", file=sys.stderr)
             sys.exit(1)
         
-        result = update_field(client, args.ticket, args.field, args.value)
+        result = update_field(spreadsheet, args.ticket, args.field, args.value)
     
     if args.json:
         print(json.dumps(result, indent=2))
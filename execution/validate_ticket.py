@@ -10,18 +10,24 @@ Usage:
     python3 validate_ticket.py --report
 """
 
+from __future__ import annotations
+
 import os
 import sys
 import re
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-import gspread
-from google.oauth2.service_account import Credentials
-from dotenv import load_dotenv
+from functools import lru_cache
+from itertools import islice, zip_longest
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional, Tuple
+from sheets_common import get_worksheet, get_worksheets
 
-load_dotenv()
+# gspread, google-auth and dotenv are imported where they are used so that
+# --help and a bare invocation return without paying their import time
+if TYPE_CHECKING:
+    import gspread
 
 SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
@@ -30,9 +36,40 @@ SCOPES = [
 
 SPREADSHEET_NAME = "Rick's TicketDrop 2.0"
 
+# Standard LSD pattern: XX-XX-XXX-XXW5
+LSD_PATTERN = re.compile(r'\d{1,2}-\d{1,2}-\d{1,3}-\d{1,2}W\d', re.ASCII)
+
+# Fields every new ticket needs
+REQUIRED_FIELDS = ('customer', 'from_lsd', 'to_lsd', 'product', 'driver', 'truck')
+
+# Ticket fields checked against SETTINGS columns
+LOOKUP_FIELDS = (
+    ('customer', 'CUSTOMERS'),
+    ('driver', 'DRIVERS'),
+    ('product', 'PRODUCTS'),
+    ('truck', 'TRUCKS'),
+)
+
+# Shape of an ISO 8601 date/time; anything else is rejected before parsing
+TIMESTAMP_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}([T ]\d{2}(:\d{2}(:\d{2}(\.\d+)?)?)?)?(Z|[+-]\d{2}(:?\d{2})?)?$')
+
 
 def get_credentials():
-    """Load Google credentials."""
+    """Load Google credentials, reusing the last ones while they are unexpired."""
+    creds = load_credentials()
+    if creds is None or creds.expired:
+        load_credentials.cache_clear()
+        creds = load_credentials()
+    return creds
+
+
+@lru_cache(maxsize=1)
+def load_credentials():
+    """Load Google credentials from token.json or the service account file."""
+    from dotenv import load_dotenv
+    from google.oauth2.service_account import Credentials
+    
+    load_dotenv()
     creds = None
     
     if os.path.exists('token.json'):
@@ -54,6 +91,16 @@ def get_credentials():
     return creds
 
 
+def to_number(value) -> float:
+    """Parse a sheet value as a number; empty or non-numeric values count as 0."""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
 def validate_lsd(value: str) -> Tuple[bool, Optional[str]]:
     """Validate LSD format or accept lease names."""
     if not value or not value.strip():
@@ -61,9 +108,7 @@ def validate_lsd(value: str) -> Tuple[bool, Optional[str]]:
     
     value = value.strip()
     
-    # Standard LSD pattern: XX-XX-XXX-XXW5
-    lsd_pattern = r'^\d{1,2}-\d{1,2}-\d{1,3}-\d{1,2}W\d$'
-    if re.match(lsd_pattern, value):
+    if LSD_PATTERN.fullmatch(value):
         return True, None
     
     # Accept any string >= 2 chars as lease name
@@ -81,8 +126,11 @@ def validate_timestamps(data: Dict) -> List[str]:
     for field in ['arrive_load', 'depart_load', 'arrive_offload', 'depart_offload']:
         value = data.get(field, '')
         if value:
+            if not TIMESTAMP_PATTERN.match(value):
+                errors.append(f"Invalid timestamp format: {field}")
+                continue
             try:
-                timestamps[field] = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                timestamps[field] = datetime.fromisoformat(value[:-1] + '+00:00' if value[-1] == 'Z' else value)
             except ValueError:
                 errors.append(f"Invalid timestamp format: {field}")
     
@@ -130,33 +178,30 @@ def validate_volume(actual_volume: float, est_volume: Optional[float] = None) ->
     return errors, warnings
 
 
+def stage_result(stage: str, errors: List[Dict], warnings: List[Dict]) -> Dict:
+    """Build the result dict shared by every validation stage."""
+    return {
+        "stage": stage,
+        "valid": not errors,
+        "errors": errors,
+        "warnings": warnings
+    }
+
+
 def validate_creation(data: Dict, settings: Dict) -> Dict:
     """Validate ticket at creation stage."""
     errors = []
     warnings = []
     
     # Required fields
-    required = ['customer', 'from_lsd', 'to_lsd', 'product', 'driver', 'truck']
-    for field in required:
-        if not data.get(field):
-            errors.append({"field": field, "message": f"Required field: {field}"})
+    errors.extend({"field": field, "message": f"Required field: {field}"}
+                  for field in REQUIRED_FIELDS if not data.get(field))
     
     # Validate against settings
-    if settings.get('CUSTOMERS'):
-        if data.get('customer') and data['customer'] not in settings['CUSTOMERS']:
-            errors.append({"field": "customer", "message": f"Unknown customer: {data['customer']}"})
-    
-    if settings.get('DRIVERS'):
-        if data.get('driver') and data['driver'] not in settings['DRIVERS']:
-            errors.append({"field": "driver", "message": f"Unknown driver: {data['driver']}"})
-    
-    if settings.get('PRODUCTS'):
-        if data.get('product') and data['product'] not in settings['PRODUCTS']:
-            errors.append({"field": "product", "message": f"Unknown product: {data['product']}"})
-    
-    if settings.get('TRUCKS'):
-        if data.get('truck') and data['truck'] not in settings['TRUCKS']:
-            errors.append({"field": "truck", "message": f"Unknown truck: {data['truck']}"})
+    for field, setting in LOOKUP_FIELDS:
+        value = data.get(field)
+        if value and settings.get(setting) and value not in settings[setting]:
+            errors.append({"field": field, "message": f"Unknown {field}: {value}"})
     
     # Validate LSDs
     for field in ['from_lsd', 'to_lsd']:
@@ -165,12 +210,7 @@ def validate_creation(data: Dict, settings: Dict) -> Dict:
             if not valid:
                 errors.append({"field": field, "message": msg})
     
-    return {
-        "stage": "creation",
-        "valid": len(errors) == 0,
-        "errors": errors,
-        "warnings": warnings
-    }
+    return stage_result("creation", errors, warnings)
 
 
 def validate_completion(data: Dict) -> Dict:
@@ -190,10 +230,10 @@ def validate_completion(data: Dict) -> Dict:
         errors.append({"field": "timestamps", "message": err})
     
     # Required volume
-    actual_vol = float(data.get('actual_volume', 0) or 0)
+    actual_vol = to_number(data.get('actual_volume'))
     vol_errors, vol_warnings = validate_volume(
         actual_vol,
-        float(data.get('est_volume', 0) or 0)
+        to_number(data.get('est_volume'))
     )
     for err in vol_errors:
         errors.append({"field": "actual_volume", "message": err})
@@ -201,18 +241,15 @@ def validate_completion(data: Dict) -> Dict:
         warnings.append({"field": "actual_volume", "message": warn})
     
     # Required hazard check and signature
-    if not data.get('hazard_check') or data.get('hazard_check', '').upper() != 'Y':
+    hazard_check = str(data.get('hazard_check') or '').upper()
+    if hazard_check != 'Y':
         errors.append({"field": "hazard_check", "message": "Hazard assessment required"})
     
-    if not data.get('signature') or data.get('signature', '').upper() != 'Y':
+    signature = str(data.get('signature') or '').upper()
+    if signature != 'Y':
         errors.append({"field": "signature", "message": "Driver signature required"})
     
-    return {
-        "stage": "completion",
-        "valid": len(errors) == 0,
-        "errors": errors,
-        "warnings": warnings
-    }
+    return stage_result("completion", errors, warnings)
 
 
 def validate_export(data: Dict) -> Dict:
@@ -221,32 +258,55 @@ def validate_export(data: Dict) -> Dict:
     warnings = []
     
     # Must be completed
-    if data.get('status', '').upper() != 'COMPLETED':
+    if str(data.get('status') or '').upper() != 'COMPLETED':
         errors.append({"field": "status", "message": "Only completed tickets can be exported"})
     
     # Required fields for AXON
-    if not data.get('actual_volume') or float(data.get('actual_volume', 0)) <= 0:
+    if to_number(data.get('actual_volume')) <= 0:
         errors.append({"field": "actual_volume", "message": "Cannot export ticket with zero volume"})
     
-    if not data.get('hours') or float(data.get('hours', 0)) <= 0:
+    if to_number(data.get('hours')) <= 0:
         errors.append({"field": "hours", "message": "Cannot export ticket with zero hours"})
     
     if not data.get('arrive_load'):
         errors.append({"field": "arrive_load", "message": "Invalid arrival timestamp"})
     
-    return {
-        "stage": "export",
-        "valid": len(errors) == 0,
-        "errors": errors,
-        "warnings": warnings
-    }
+    return stage_result("export", errors, warnings)
 
 
-def load_settings(client: gspread.Client) -> Dict:
-    """Load settings from Google Sheet."""
+class RowView:
+    """Read-only dict-style view of one sheet row through a header->column map shared by all rows."""
+    __slots__ = ('row', 'columns')
+    
+    def __init__(self, row: List[str], columns: Dict[str, int]):
+        self.row = row
+        self.columns = columns
+    
+    def __getitem__(self, key: str) -> str:
+        col = self.columns[key]
+        return self.row[col] if col < len(self.row) else ''
+    
+    def get(self, key: str, default=None):
+        if key not in self.columns:
+            return default
+        return self[key]
+
+
+def records_from_values(values: List[List[str]]) -> List[RowView]:
+    """Turn a header row plus data rows into header-keyed row views, like get_all_records."""
+    if not values:
+        return []
+    
+    columns = {}
+    for col, header in enumerate(values[0]):
+        columns.setdefault(header, col)
+    return [RowView(row, columns) for row in values[1:]]
+
+
+def load_settings(spreadsheet: gspread.Spreadsheet) -> Dict[str, FrozenSet[str]]:
+    """Load settings from Google Sheet as sets for membership checks."""
     try:
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        worksheet = spreadsheet.worksheet("SETTINGS")
+        worksheet = get_worksheet(spreadsheet, "SETTINGS")
         
         data = worksheet.get_all_values()
         if not data:
@@ -255,9 +315,11 @@ def load_settings(client: gspread.Client) -> Dict:
         settings = {}
         headers = data[0]
         
+        # Transpose once instead of re-indexing every row for every column
+        columns = list(zip_longest(*data[1:], fillvalue=''))
         for col_idx, header in enumerate(headers):
-            values = [row[col_idx] for row in data[1:] if len(row) > col_idx and row[col_idx]]
-            settings[header.upper()] = values
+            column = columns[col_idx] if col_idx < len(columns) else ()
+            settings[header.upper()] = frozenset(value for value in column if value)
         
         return settings
     
@@ -266,19 +328,17 @@ def load_settings(client: gspread.Client) -> Dict:
         return {}
 
 
-def validate_tickets_batch(client: gspread.Client, stage: str, settings: Dict) -> Dict:
+def validate_tickets_batch(spreadsheet: gspread.Spreadsheet, stage: str, settings: Dict) -> Dict:
     """Validate all tickets at a given stage."""
     try:
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        
         sheet_map = {
             'creation': 'DISPATCH BOARD',
             'completion': 'ACTIVE TICKETS',
             'export': 'COMPLETED TICKETS'
         }
         
-        worksheet = spreadsheet.worksheet(sheet_map.get(stage, 'ACTIVE TICKETS'))
-        records = worksheet.get_all_records()
+        worksheet = get_worksheet(spreadsheet, sheet_map.get(stage, 'ACTIVE TICKETS'))
+        records = records_from_values(worksheet.get_values())
         
         results = {'passed': [], 'failed': [], 'warnings': []}
         
@@ -320,7 +380,7 @@ def validate_tickets_batch(client: gspread.Client, stage: str, settings: Dict) -
         return {'error': str(e)}
 
 
-def generate_report(client: gspread.Client, settings: Dict) -> str:
+def generate_report(spreadsheet: gspread.Spreadsheet, settings: Dict) -> str:
     """Generate a comprehensive validation report."""
     report = []
     report.append("=" * 60)
@@ -329,9 +389,14 @@ def generate_report(client: gspread.Client, settings: Dict) -> str:
     report.append(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
     report.append("")
     
-    for stage in ['creation', 'completion', 'export']:
-        result = validate_tickets_batch(client, stage, settings)
-        
+    # Each stage reads a different sheet, so fetch and validate them concurrently;
+    # the worksheet map is resolved first so the threads don't race to build it
+    stages = ['creation', 'completion', 'export']
+    get_worksheets(spreadsheet)
+    with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+        results = list(executor.map(lambda stage: validate_tickets_batch(spreadsheet, stage, settings), stages))
+    
+    for stage, result in zip(stages, results):
         if 'error' in result:
             report.append(f"\n{stage.upper()}: Error - {result['error']}")
             continue
@@ -345,14 +410,14 @@ def generate_report(client: gspread.Client, settings: Dict) -> str:
         
         if result['results']['failed']:
             report.append("\nFailed tickets:")
-            for fail in result['results']['failed'][:10]:
+            for fail in islice(result['results']['failed'], 10):
                 report.append(f"  {fail['ticket_number']}:")
                 for err in fail['errors']:
                     report.append(f"    - {err['field']}: {err['message']}")
         
         if result['results']['warnings']:
             report.append("\nWarnings:")
-            for warn in result['results']['warnings'][:10]:
+            for warn in islice(result['results']['warnings'], 10):
                 report.append(f"  {warn['ticket_number']}:")
                 for w in warn['warnings']:
                     report.append(f"    - {w['field']}: {w['message']}")
@@ -371,20 +436,33 @@ def main():
     
     args = parser.parse_args()
     
+    if not (args.report or args.stage or args.ticket):
+        parser.print_help()
+        return
+    
     creds = get_credentials()
     if not creds:
         print("Error: Could not load Google credentials", file=sys.stderr)
         sys.exit(1)
     
+    import gspread
     client = gspread.authorize(creds)
-    settings = load_settings(client)
+    
+    # Open the spreadsheet once for settings and every stage
+    try:
+        spreadsheet = client.open(SPREADSHEET_NAME)
+    except Exception as e:
+        print(f"Error: Could not open {SPREADSHEET_NAME}: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    settings = load_settings(spreadsheet)
     
     if args.report:
-        report = generate_report(client, settings)
+        report = generate_report(spreadsheet, settings)
         print(report)
     
     elif args.stage:
-        result = validate_tickets_batch(client, args.stage, settings)
+        result = validate_tickets_batch(spreadsheet, args.stage, settings)
         
         if args.json:
             print(json.dumps(result, indent=2))
@@ -402,25 +480,22 @@ def main():
     
     elif args.ticket:
         try:
-            spreadsheet = client.open(SPREADSHEET_NAME)
             ticket_data = None
             found_sheet = None
             
-            for sheet_name in ['DISPATCH BOARD', 'ACTIVE TICKETS', 'COMPLETED TICKETS']:
-                try:
-                    worksheet = spreadsheet.worksheet(sheet_name)
-                    records = worksheet.get_all_records()
-                    
-                    for row in records:
-                        if str(row.get('ticket_number', row.get('Ticket#', ''))) == args.ticket:
-                            ticket_data = row
-                            found_sheet = sheet_name
-                            break
-                    
-                    if ticket_data:
+            # Read all three sheets in a single request
+            sheet_names = ['DISPATCH BOARD', 'ACTIVE TICKETS', 'COMPLETED TICKETS']
+            value_ranges = spreadsheet.values_batch_get([f"'{name}'" for name in sheet_names]).get('valueRanges', [])
+            
+            for sheet_name, value_range in zip(sheet_names, value_ranges):
+                for row in records_from_values(value_range.get('values', [])):
+                    if str(row.get('ticket_number', row.get('Ticket#', ''))) == args.ticket:
+                        ticket_data = row
+                        found_sheet = sheet_name
                         break
-                except:
-                    continue
+                
+                if ticket_data:
+                    break
             
             if not ticket_data:
                 print(f"Ticket {args.ticket} not found")
@@ -462,9 +537,6 @@ def main():
         except Exception as e:
             print(f"Error: {e}", file=sys.stderr)
             sys.exit(1)
-    
-    else:
-        parser.print_help()
 
 
 if __name__ == "__main__":
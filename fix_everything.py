@@ -26,11 +26,14 @@ client = gspread.authorize(creds)
 spreadsheet = client.open("Rick's TicketDrop 2.0")
 print("✓ Connected!")
 
+# Every write below is collected here as (sheet, rows from A1) and sent in
+# one request at the end
+updates = []
+
 # ============================================================
 # FIX 1: DISPATCH BOARD Headers
 # ============================================================
 print("\n--- Fixing DISPATCH BOARD ---")
-dispatch = spreadsheet.worksheet('DISPATCH BOARD')
 
 dispatch_headers = [
     'CREATE', 'TICKET #', 'DATE', 'CUSTOMER', 'FROM LSD', 'TO LSD', 
@@ -38,14 +41,13 @@ dispatch_headers = [
     'SPECIAL INSTRUCTIONS', 'PRIORITY'
 ]
 
-dispatch.update('A1:M1', [dispatch_headers])
-print(f"✓ DISPATCH BOARD: {len(dispatch_headers)} columns set")
+updates.append(('DISPATCH BOARD', [dispatch_headers]))
+print(f"  DISPATCH BOARD: {len(dispatch_headers)} columns")
 
 # ============================================================
 # FIX 2: ACTIVE TICKETS Headers (THIS IS THE IMPORTANT ONE!)
 # ============================================================
 print("\n--- Fixing ACTIVE TICKETS ---")
-active = spreadsheet.worksheet('ACTIVE TICKETS')
 
 active_headers = [
     'TICKET #',           # A
@@ -80,8 +82,8 @@ active_headers = [
     'UPDATED AT'          # AD
 ]
 
-active.update('A1:AD1', [active_headers])
-print(f"✓ ACTIVE TICKETS: {len(active_headers)} columns set")
+updates.append(('ACTIVE TICKETS', [active_headers]))
+print(f"  ACTIVE TICKETS: {len(active_headers)} columns")
 print("  ✓ ARRIVE LOAD column: N")
 print("  ✓ DEPART LOAD column: O")
 print("  ✓ ARRIVE OFFLOAD column: P")
@@ -91,7 +93,6 @@ print("  ✓ DEPART OFFLOAD column: Q")
 # FIX 3: COMPLETED TICKETS Headers
 # ============================================================
 print("\n--- Fixing COMPLETED TICKETS ---")
-completed = spreadsheet.worksheet('COMPLETED TICKETS')
 
 completed_headers = active_headers + [
     'COMPLETED AT',       # AE
@@ -100,14 +101,13 @@ completed_headers = active_headers + [
     'EXPORT FILE'         # AH
 ]
 
-completed.update('A1:AH1', [completed_headers])
-print(f"✓ COMPLETED TICKETS: {len(completed_headers)} columns set")
+updates.append(('COMPLETED TICKETS', [completed_headers]))
+print(f"  COMPLETED TICKETS: {len(completed_headers)} columns")
 
 # ============================================================
 # FIX 4: AXON EXPORT Headers
 # ============================================================
 print("\n--- Fixing AXON EXPORT ---")
-axon = spreadsheet.worksheet('AXON EXPORT')
 
 axon_headers = [
     'Attachment', 'Customer', 'Location', 'Start Date', 'Reference',
@@ -116,15 +116,14 @@ axon_headers = [
     'Charge', 'Job Desc', 'Company', 'Status'
 ]
 
-axon.update('A1:S1', [axon_headers])
-print(f"✓ AXON EXPORT: {len(axon_headers)} columns set")
+updates.append(('AXON EXPORT', [axon_headers]))
+print(f"  AXON EXPORT: {len(axon_headers)} columns")
 
 # ============================================================
 # FIX 5: SETTINGS (make sure it has data)
 # ============================================================
 print("\n--- Checking SETTINGS ---")
-settings = spreadsheet.worksheet('SETTINGS')
-data = settings.get_all_values()
+data = spreadsheet.values_get("'SETTINGS'").get('values', [])
 
 if len(data) <= 1:
     print("  Adding sample data to SETTINGS...")
@@ -139,11 +138,37 @@ if len(data) <= 1:
         ['Andcol Oilfield', '', 'Sand/Gravel', 'Unit 7', ''],
         ['Derrick Fenton (Smolz)', '', '', '', ''],
     ]
-    settings.update('A1:E9', settings_data)
-    print("✓ SETTINGS: Sample data added")
+    updates.append(('SETTINGS', settings_data))
 else:
     print(f"✓ SETTINGS: Already has {len(data)} rows")
 
+# ============================================================
+# WRITE: values, bold headers and frozen header rows in one request
+# ============================================================
+print("\n--- Writing changes ---")
+sheet_ids = {ws.title: ws.id for ws in spreadsheet.worksheets()}
+requests = []
+
+for title, rows in updates:
+    sheet_id = sheet_ids[title]
+    requests.append({'updateCells': {
+        'start': {'sheetId': sheet_id, 'rowIndex': 0, 'columnIndex': 0},
+        'rows': [{'values': [{'userEnteredValue': {'stringValue': v}} for v in row]} for row in rows],
+        'fields': 'userEnteredValue',
+    }})
+    requests.append({'repeatCell': {
+        'range': {'sheetId': sheet_id, 'startRowIndex': 0, 'endRowIndex': 1},
+        'cell': {'userEnteredFormat': {'textFormat': {'bold': True}}},
+        'fields': 'userEnteredFormat.textFormat.bold',
+    }})
+    requests.append({'updateSheetProperties': {
+        'properties': {'sheetId': sheet_id, 'gridProperties': {'frozenRowCount': 1}},
+        'fields': 'gridProperties.frozenRowCount',
+    }})
+
+spreadsheet.batch_update({'requests': requests})
+print(f"✓ {len(updates)} sheets updated (header rows bold and frozen)")
+
 # ============================================================
 # DONE!
 # ============================================================
@@ -13,6 +13,48 @@ SCOPES = [
     "https://www.googleapis.com/auth/drive"
 ]
 
+# Header rows for each tab
+DISPATCH_HEADERS = (
+    'CREATE', 'TICKET #', 'DATE', 'CUSTOMER', 'FROM LSD', 'TO LSD', 
+    'PRODUCT', 'DRIVER', 'TRUCK', 'TRAILER', 'EST VOLUME', 
+    'SPECIAL INSTRUCTIONS', 'PRIORITY'
+)
+
+ACTIVE_HEADERS = (
+    'TICKET #', 'DATE', 'CUSTOMER', 'FROM LSD', 'TO LSD', 
+    'PRODUCT', 'DRIVER', 'TRUCK', 'TRAILER', 'EST VOLUME',
+    'SPECIAL INSTRUCTIONS', 'PRIORITY', 'STATUS',
+    'ARRIVE LOAD', 'DEPART LOAD', 'ARRIVE OFFLOAD', 'DEPART OFFLOAD',
+    'ACTUAL VOLUME', 'HOURS', 'WAIT TIME', 'HAZARD CHECK', 'SIGNATURE',
+    'NOTES', 'CREATED AT', 'UPDATED AT'
+)
+
+COMPLETED_HEADERS = ACTIVE_HEADERS + ('COMPLETED AT', 'EXPORTED', 'EXPORTED AT', 'EXPORT FILE')
+
+# AXON EXPORT headers (B622 format)
+AXON_HEADERS = (
+    'Attachment', 'Customer', 'Location', 'Start Date', 'Reference',
+    'Ticket#', 'Truck#', 'Operator', 'Trailer#', 'Product',
+    'Actual Vol', 'Product2', 'From LSD', 'To LSD', 'Hours',
+    'Charge', 'Job Desc', 'Company', 'Status'
+)
+
+# SETTINGS with Rick's data
+SETTINGS_DATA = (
+    ('DRIVERS', 'CUSTOMERS', 'PRODUCTS', 'TRUCKS', 'TRAILERS'),
+    ('Brant Fandrey', 'Spur Petroleum Corp', 'Crude Oil', 'Unit 1', 'T-001'),
+    ('Dennis Fandrey', 'Inter Pipeline Ltd', 'Fresh Water', 'Unit 2', 'T-002'),
+    ('Shane Fandrey', 'Canadian Natural Resources', 'Produced Water', 'Unit 3', 'T-003'),
+    ('Terry Fandrey', 'ATCO Pipelines', 'Condensate', 'Unit 4', 'T-004'),
+    ('Warren Fandrey', 'Pembina Pipeline', 'Slop Oil', 'Unit 5', 'T-005'),
+    ('Ahmet (Cloud 9)', 'Plains Midstream', 'Equipment/Tools', 'Unit 6', ''),
+    ('Andcol Oilfield', '', 'Sand/Gravel', 'Unit 7', ''),
+    ('Derrick Fenton (Smolz)', '', '', '', ''),
+    ('Dwayne Fenton (Smolz)', '', '', '', ''),
+    ('Geoff Fenton (Smolz)', '', '', '', ''),
+    ('Zack Fenton (Smolz)', '', '', '', ''),
+)
+
 print("\n" + "="*60)
 print("TicketDrop 2.0 - One-Time Sheet Setup")
 print("="*60 + "\n")
@@ -29,87 +71,45 @@ print(f"✓ Connected to: {spreadsheet.title}")
 TABS_NEEDED = ['DISPATCH BOARD', 'ACTIVE TICKETS', 'COMPLETED TICKETS', 'AXON EXPORT', 'SETTINGS']
 
 # Get existing tabs
-existing_tabs = [ws.title for ws in spreadsheet.worksheets()]
-print(f"  Existing tabs: {existing_tabs}")
+sheet_ids = {ws.title: ws.id for ws in spreadsheet.worksheets()}
+print(f"  Existing tabs: {list(sheet_ids)}")
 
-# Create missing tabs
+# Create missing tabs and delete the default Sheet1 in one request
+requests = []
 for tab_name in TABS_NEEDED:
-    if tab_name not in existing_tabs:
-        spreadsheet.add_worksheet(title=tab_name, rows=1000, cols=30)
-        print(f"✓ Created tab: {tab_name}")
+    if tab_name not in sheet_ids:
+        requests.append({'addSheet': {'properties': {
+            'title': tab_name,
+            'gridProperties': {'rowCount': 1000, 'columnCount': 30},
+        }}})
+        print(f"✓ Creating tab: {tab_name}")
     else:
         print(f"  Tab exists: {tab_name}")
 
-# Delete default Sheet1 if it exists and we have other tabs
-existing_tabs = [ws.title for ws in spreadsheet.worksheets()]
-if 'Sheet1' in existing_tabs and len(existing_tabs) > 1:
-    spreadsheet.del_worksheet(spreadsheet.worksheet('Sheet1'))
-    print(f"✓ Deleted: Sheet1")
-
-# Set up DISPATCH BOARD headers
-print("\n--- Setting up DISPATCH BOARD ---")
-dispatch_board = spreadsheet.worksheet('DISPATCH BOARD')
-dispatch_headers = [
-    'CREATE', 'TICKET #', 'DATE', 'CUSTOMER', 'FROM LSD', 'TO LSD', 
-    'PRODUCT', 'DRIVER', 'TRUCK', 'TRAILER', 'EST VOLUME', 
-    'SPECIAL INSTRUCTIONS', 'PRIORITY'
-]
-dispatch_board.update('A1:M1', [dispatch_headers])
-print(f"✓ Added headers to DISPATCH BOARD")
-
-# Set up ACTIVE TICKETS headers
-print("\n--- Setting up ACTIVE TICKETS ---")
-active_tickets = spreadsheet.worksheet('ACTIVE TICKETS')
-active_headers = [
-    'TICKET #', 'DATE', 'CUSTOMER', 'FROM LSD', 'TO LSD', 
-    'PRODUCT', 'DRIVER', 'TRUCK', 'TRAILER', 'EST VOLUME',
-    'SPECIAL INSTRUCTIONS', 'PRIORITY', 'STATUS',
-    'ARRIVE LOAD', 'DEPART LOAD', 'ARRIVE OFFLOAD', 'DEPART OFFLOAD',
-    'ACTUAL VOLUME', 'HOURS', 'WAIT TIME', 'HAZARD CHECK', 'SIGNATURE',
-    'NOTES', 'CREATED AT', 'UPDATED AT'
-]
-active_tickets.update('A1:Y1', [active_headers])
-print(f"✓ Added headers to ACTIVE TICKETS")
-
-# Set up COMPLETED TICKETS headers
-print("\n--- Setting up COMPLETED TICKETS ---")
-completed_tickets = spreadsheet.worksheet('COMPLETED TICKETS')
-completed_headers = active_headers + ['COMPLETED AT', 'EXPORTED', 'EXPORTED AT', 'EXPORT FILE']
-completed_tickets.update('A1:AC1', [completed_headers])
-print(f"✓ Added headers to COMPLETED TICKETS")
-
-# Set up AXON EXPORT headers (B622 format)
-print("\n--- Setting up AXON EXPORT ---")
-axon_export = spreadsheet.worksheet('AXON EXPORT')
-axon_headers = [
-    'Attachment', 'Customer', 'Location', 'Start Date', 'Reference',
-    'Ticket#', 'Truck#', 'Operator', 'Trailer#', 'Product',
-    'Actual Vol', 'Product2', 'From LSD', 'To LSD', 'Hours',
-    'Charge', 'Job Desc', 'Company', 'Status'
-]
-axon_export.update('A1:S1', [axon_headers])
-print(f"✓ Added headers to AXON EXPORT")
-
-# Set up SETTINGS with Rick's data
-print("\n--- Setting up SETTINGS ---")
-settings = spreadsheet.worksheet('SETTINGS')
-
-settings_data = [
-    ['DRIVERS', 'CUSTOMERS', 'PRODUCTS', 'TRUCKS', 'TRAILERS'],
-    ['Brant Fandrey', 'Spur Petroleum Corp', 'Crude Oil', 'Unit 1', 'T-001'],
-    ['Dennis Fandrey', 'Inter Pipeline Ltd', 'Fresh Water', 'Unit 2', 'T-002'],
-    ['Shane Fandrey', 'Canadian Natural Resources', 'Produced Water', 'Unit 3', 'T-003'],
-    ['Terry Fandrey', 'ATCO Pipelines', 'Condensate', 'Unit 4', 'T-004'],
-    ['Warren Fandrey', 'Pembina Pipeline', 'Slop Oil', 'Unit 5', 'T-005'],
-    ['Ahmet (Cloud 9)', 'Plains Midstream', 'Equipment/Tools', 'Unit 6', ''],
-    ['Andcol Oilfield', '', 'Sand/Gravel', 'Unit 7', ''],
-    ['Derrick Fenton (Smolz)', '', '', '', ''],
-    ['Dwayne Fenton (Smolz)', '', '', '', ''],
-    ['Geoff Fenton (Smolz)', '', '', '', ''],
-    ['Zack Fenton (Smolz)', '', '', '', ''],
+# Sheet1 is never one of TABS_NEEDED, so once they exist it is never the last tab
+if 'Sheet1' in sheet_ids:
+    requests.append({'deleteSheet': {'sheetId': sheet_ids['Sheet1']}})
+    print(f"✓ Deleting: Sheet1")
+
+if requests:
+    spreadsheet.batch_update({'requests': requests})
+
+# Every write, as (range, rows), sent in one request
+updates = [
+    ("'DISPATCH BOARD'!A1:M1", [DISPATCH_HEADERS]),
+    ("'ACTIVE TICKETS'!A1:Y1", [ACTIVE_HEADERS]),
+    ("'COMPLETED TICKETS'!A1:AC1", [COMPLETED_HEADERS]),
+    ("'AXON EXPORT'!A1:S1", [AXON_HEADERS]),
+    ("'SETTINGS'!A1:E12", SETTINGS_DATA),
 ]
 
-settings.update('A1:E12', settings_data)
+# Write all headers and SETTINGS data in one request
+print("\n--- Writing changes ---")
+spreadsheet.values_batch_update({
+    'valueInputOption': 'RAW',
+    'data': [{'range': rng, 'values': rows} for rng, rows in updates],
+})
+print(f"✓ Added headers to DISPATCH BOARD, ACTIVE TICKETS, COMPLETED TICKETS, AXON EXPORT")
 print(f"✓ Added SETTINGS data (11 drivers, 6 customers, 7 products, 7 trucks, 5 trailers)")
 
 # Done!
@@ -4,15 +4,20 @@ Matches Rick's Oilfield Hauling ticket format exactly
 """
 
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+import hashlib
+import json
 import os
+import re
+import threading
+import zipfile
+from auth import get_spreadsheet, get_worksheet
 
 # Page config
 st.set_page_config(
@@ -21,248 +26,467 @@ st.set_page_config(
     layout="wide"
 )
 
-# Google Auth
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
+# Local mirror of COMPLETED TICKETS, re-downloaded only when the spreadsheet changes
+SNAPSHOT_FILE = os.path.join('.tmp', 'completed_tickets.json')
 
-@st.cache_resource
-def get_google_client():
-    """Connect to Google Sheets."""
+# Default folder for "Save All PDFs to Folder", e.g. the AXON attachments share
+PDF_OUTPUT_DIR = os.getenv("AXON_ATTACHMENTS_DIR", "out")
+
+# Generated PDFs, named by a hash of the ticket row they were drawn from
+PDF_CACHE_DIR = os.path.join('.tmp', 'pdf_cache')
+# Bump whenever draw_layout changes so cached PDFs in the old layout are not reused
+PDF_LAYOUT_VERSION = 1
+
+def read_snapshot(modified_time):
+    """Return the mirrored tickets if they were saved at modified_time."""
     try:
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-    except:
-        creds = Credentials.from_service_account_file('service_account.json', scopes=SCOPES)
-    return gspread.authorize(creds)
+        with open(SNAPSHOT_FILE, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get('modified_time') != modified_time:
+        return None
+    return snapshot.get('tickets')
 
-@st.cache_data(ttl=60)
+def write_snapshot(modified_time, tickets):
+    """Save tickets to the local mirror; a failed write only costs a re-download."""
+    try:
+        os.makedirs(os.path.dirname(SNAPSHOT_FILE), exist_ok=True)
+        tmp_file = SNAPSHOT_FILE + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'modified_time': modified_time, 'tickets': tickets}, f)
+        os.replace(tmp_file, SNAPSHOT_FILE)
+    except OSError:
+        pass
+
+@st.cache_data(ttl=300)
 def load_completed_tickets():
-    """Load completed tickets from Google Sheet."""
+    """Load completed tickets, from the local mirror unless the sheet has changed."""
     try:
-        client = get_google_client()
-        spreadsheet = client.open("Rick's TicketDrop 2.0")
-        worksheet = spreadsheet.worksheet('COMPLETED TICKETS')
-        data = worksheet.get_all_records()
-        return data
+        # One Drive metadata call decides whether the Sheets read is needed at all
+        modified_time = get_spreadsheet().get_lastUpdateTime()
+        tickets = read_snapshot(modified_time)
+        if tickets is not None:
+            return tickets
+        
+        worksheet = get_worksheet('COMPLETED TICKETS')
+        rows = worksheet.get_values()
+        headers = rows[0] if rows else []
+        tickets = [dict(zip(headers, row)) for row in rows[1:]]
+        write_snapshot(modified_time, tickets)
+        return tickets
     except Exception as e:
         st.error(f"Error loading tickets: {e}")
         return []
 
-def generate_ticket_pdf(ticket_data):
-    """Generate a PDF ticket matching Rick's Oilfield Hauling format."""
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Starting Y position
-    y = height - 50
-    
+@st.cache_data(ttl=60)
+def load_ticket_index():
+    """Load the ticket picker as {label: entry} from the ticket #, date and customer columns."""
+    try:
+        worksheet = get_worksheet('COMPLETED TICKETS')
+        rows = worksheet.get_values('A1:C')
+        headers = rows[0] if rows else []
+        # Labels are built here so reruns reuse them from the cache
+        options = {}
+        for i, row in enumerate(rows[1:], start=2):
+            t = dict(zip(headers, row), row=i)
+            options[f"{t.get('ticket_number', 'N/A')} - {t.get('customer', 'Unknown')} ({t.get('date', '')})"] = t
+        return options
+    except Exception as e:
+        st.error(f"Error loading tickets: {e}")
+        return {}
+
+@st.cache_data(ttl=3600, max_entries=64)
+def fetch_ticket_row(row_number, ticket_number):
+    """Load one full ticket row; raises LookupError if it now holds another ticket.
+    
+    Errors are raised rather than returned so a shifted or failed read is never cached.
+    """
+    worksheet = get_worksheet('COMPLETED TICKETS')
+    header_range, row_range = worksheet.batch_get(['1:1', f'{row_number}:{row_number}'])
+    headers = header_range[0] if header_range else []
+    row = row_range[0] if row_range else []
+    ticket = dict(zip(headers, row))
+    if str(ticket.get('ticket_number', '')) != str(ticket_number):
+        raise LookupError(f"row {row_number} no longer holds ticket {ticket_number}")
+    return ticket
+
+def load_ticket_row(row_number, ticket_number):
+    """Load one full ticket row, re-reading the ticket index once if the row has shifted."""
+    try:
+        try:
+            return fetch_ticket_row(row_number, ticket_number)
+        except LookupError:
+            # The cached index is stale; rebuild it and look the ticket up again
+            load_ticket_index.clear()
+            rows = {t.get('ticket_number'): t['row'] for t in load_ticket_index().values()}
+            if ticket_number not in rows:
+                return {}
+            return fetch_ticket_row(rows[ticket_number], ticket_number)
+    except Exception as e:
+        st.error(f"Error loading ticket {ticket_number}: {e}")
+        return {}
+
+# (font name, size) pairs used on the ticket
+REGULAR_8 = ("Helvetica", 8)
+REGULAR_9 = ("Helvetica", 9)
+REGULAR_10 = ("Helvetica", 10)
+BOLD_9 = ("Helvetica-Bold", 9)
+BOLD_10 = ("Helvetica-Bold", 10)
+BOLD_11 = ("Helvetica-Bold", 11)
+BOLD_14 = ("Helvetica-Bold", 14)
+BOLD_18 = ("Helvetica-Bold", 18)
+
+def set_font(c, font):
+    """Set the canvas font, skipping the call if it is already current."""
+    if (getattr(c, '_fontname', None), getattr(c, '_fontsize', None)) != font:
+        c.setFont(*font)
+
+def ticket_value(ticket_data, key, limit=None):
+    """Return a ticket field as text, cut to limit characters if given."""
+    value = ticket_data.get(key, '')
+    if not isinstance(value, str):
+        value = str(value)
+    return value[:limit] if limit else value
+
+def draw_row(c, y, cells):
+    """Draw (x, text) cells on one baseline as a single text object in the current font."""
+    text = c.beginText()
+    for x, s in cells:
+        text.setTextOrigin(x, y)
+        text.textOut(s)
+    c.drawText(text)
+
+class SkipDrawing:
+    """Canvas stand-in that ignores every drawing call."""
+    def __getattr__(self, name):
+        # Returning self lets text objects begun on it be ignored the same way
+        return lambda *args, **kwargs: self
+
+# Baselines of each ticket row, top to bottom (letter is fixed, so these are too)
+PAGE_WIDTH, PAGE_HEIGHT = letter
+Y_HEADER = PAGE_HEIGHT - 50
+Y_ASSIGN_LINE = Y_HEADER - 80
+Y_ASSIGN_TITLE = Y_ASSIGN_LINE - 15
+Y_ASSIGN_LABELS = Y_ASSIGN_TITLE - 20
+Y_ASSIGN_VALUES = Y_ASSIGN_LABELS - 12
+Y_DETAILS_LINE = Y_ASSIGN_VALUES - 30
+Y_DETAILS_TITLE = Y_DETAILS_LINE - 15
+Y_CUSTOMER_LABELS = Y_DETAILS_TITLE - 25
+Y_CUSTOMER_VALUES = Y_CUSTOMER_LABELS - 12
+Y_LOCATION_LABEL = Y_CUSTOMER_VALUES - 25
+Y_LOCATION_VALUE = Y_LOCATION_LABEL - 12
+Y_TANK_LABELS = Y_LOCATION_VALUE - 30
+Y_TANK_VALUES = Y_TANK_LABELS - 12
+Y_ARRIVE_LABELS = Y_TANK_LABELS - 40
+Y_ARRIVE_VALUES = Y_ARRIVE_LABELS - 12
+Y_DEPART_LABELS = Y_ARRIVE_VALUES - 20
+Y_DEPART_VALUES = Y_DEPART_LABELS - 12
+Y_VOLUME_LABELS = Y_DEPART_VALUES - 20
+Y_VOLUME_VALUES = Y_VOLUME_LABELS - 12
+Y_COMMENT_LABELS = Y_VOLUME_VALUES - 30
+Y_COMMENT_VALUES = Y_COMMENT_LABELS - 12
+Y_PRODUCT_LABELS = Y_COMMENT_VALUES - 30
+Y_PRODUCT_VALUES = Y_PRODUCT_LABELS - 12
+Y_BILLING_LABELS = Y_PRODUCT_VALUES - 25
+Y_BILLING_VALUES = Y_BILLING_LABELS - 12
+Y_TOTALS_LABELS = Y_BILLING_VALUES - 25
+Y_TOTALS_VALUES = Y_TOTALS_LABELS - 12
+Y_HAZARD_LINE = Y_TOTALS_VALUES - 40
+Y_HAZARD_TEXT = Y_HAZARD_LINE - 15
+
+def draw_layout(t, f, ticket_data):
+    """Draw a ticket in Rick's Oilfield Hauling format.
+
+    Static labels and lines go to canvas t and ticket values to canvas f, so the
+    static part can be drawn once as a form and reused for every page.
+    """
     # === HEADER ===
     # Rick's Oilfield Hauling logo area
-    c.setFont("Helvetica-Bold", 18)
-    c.drawString(50, y, "Rick's")
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(110, y, "OILFIELD")
-    c.drawString(110, y - 15, "HAULING")
+    set_font(t, BOLD_18)
+    t.drawString(50, Y_HEADER, "Rick's")
+    set_font(t, BOLD_14)
+    t.drawString(110, Y_HEADER, "OILFIELD")
+    t.drawString(110, Y_HEADER - 15, "HAULING")
     
     # Contact info
-    c.setFont("Helvetica", 9)
-    c.drawString(250, y, "4606 51 Ave, Redwater, AB")
-    c.drawString(250, y - 12, "24 Hour Emergency Number:")
-    c.drawString(250, y - 24, "(780) 942-2932")
+    set_font(t, REGULAR_9)
+    t.drawString(250, Y_HEADER, "4606 51 Ave, Redwater, AB")
+    t.drawString(250, Y_HEADER - 12, "24 Hour Emergency Number:")
+    t.drawString(250, Y_HEADER - 24, "(780) 942-2932")
     
     # Ticket number and date (right side)
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(450, y, "Rick's Ticket #")
-    c.setFont("Helvetica", 10)
-    c.drawString(450, y - 12, str(ticket_data.get('ticket_number', '')))
-    c.drawString(450, y - 30, "Date")
-    c.drawString(450, y - 42, str(ticket_data.get('date', '')))
-    
-    y -= 80
+    set_font(t, BOLD_10)
+    t.drawString(450, Y_HEADER, "Rick's Ticket #")
+    set_font(t, REGULAR_10)
+    t.drawString(450, Y_HEADER - 30, "Date")
+    set_font(f, REGULAR_10)
+    f.drawString(450, Y_HEADER - 12, ticket_value(ticket_data, 'ticket_number'))
+    f.drawString(450, Y_HEADER - 42, ticket_value(ticket_data, 'date'))
     
     # === ASSIGNMENT/VEHICLE DETAILS ===
-    c.setFont("Helvetica-Bold", 11)
-    c.line(50, y, width - 50, y)
-    y -= 15
-    c.drawCentredString(width/2, y, "Assignment/Vehicle Details")
-    y -= 20
+    set_font(t, BOLD_11)
+    t.line(50, Y_ASSIGN_LINE, PAGE_WIDTH - 50, Y_ASSIGN_LINE)
+    t.drawCentredString(PAGE_WIDTH/2, Y_ASSIGN_TITLE, "Assignment/Vehicle Details")
     
     # Vehicle details table
-    c.setFont("Helvetica", 9)
+    set_font(t, REGULAR_9)
     col1, col2, col3, col4 = 50, 200, 350, 480
     
-    c.drawString(col1, y, "Operator")
-    c.drawString(col2, y, "Truck #")
-    c.drawString(col3, y, "Trailer #")
-    c.drawString(col4, y, "Company Name")
-    y -= 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(col1, y, str(ticket_data.get('driver', '')))
-    c.drawString(col2, y, str(ticket_data.get('truck', '')))
-    c.drawString(col3, y, str(ticket_data.get('trailer', '')))
-    c.drawString(col4, y, "Ricks OilField Hauling")
-    
-    y -= 30
+    draw_row(t, Y_ASSIGN_LABELS, [
+        (col1, "Operator"),
+        (col2, "Truck #"),
+        (col3, "Trailer #"),
+        (col4, "Company Name"),
+    ])
+    set_font(f, BOLD_9)
+    draw_row(f, Y_ASSIGN_VALUES, [
+        (col1, ticket_value(ticket_data, 'driver')),
+        (col2, ticket_value(ticket_data, 'truck')),
+        (col3, ticket_value(ticket_data, 'trailer')),
+    ])
+    set_font(t, BOLD_9)
+    t.drawString(col4, Y_ASSIGN_VALUES, "Ricks OilField Hauling")
     
     # === TICKET DETAILS ===
-    c.setFont("Helvetica-Bold", 11)
-    c.line(50, y, width - 50, y)
-    y -= 15
-    c.drawCentredString(width/2, y, "Ticket Details")
-    y -= 25
+    set_font(t, BOLD_11)
+    t.line(50, Y_DETAILS_LINE, PAGE_WIDTH - 50, Y_DETAILS_LINE)
+    t.drawCentredString(PAGE_WIDTH/2, Y_DETAILS_TITLE, "Ticket Details")
     
     # Customer info
-    c.setFont("Helvetica", 9)
-    c.drawString(50, y, "Customer Name")
-    c.drawString(350, y, "Consignor Address")
-    y -= 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(50, y, str(ticket_data.get('customer', '')))
-    c.drawString(350, y, str(ticket_data.get('consignor_address', '')))
-    
-    y -= 25
-    c.setFont("Helvetica", 9)
-    c.drawString(50, y, "Location")
-    y -= 12
-    c.setFont("Helvetica-Bold", 9)
+    set_font(t, REGULAR_9)
+    draw_row(t, Y_CUSTOMER_LABELS, [
+        (50, "Customer Name"),
+        (350, "Consignor Address"),
+    ])
+    set_font(f, BOLD_9)
+    draw_row(f, Y_CUSTOMER_VALUES, [
+        (50, ticket_value(ticket_data, 'customer')),
+        (350, ticket_value(ticket_data, 'consignor_address')),
+    ])
+    
+    set_font(t, REGULAR_9)
+    t.drawString(50, Y_LOCATION_LABEL, "Location")
+    set_font(f, BOLD_9)
     location = f"{ticket_data.get('from_location', '')} To {ticket_data.get('to_location', '')}"
-    c.drawString(50, y, location)
-    
-    y -= 30
+    f.drawString(50, Y_LOCATION_VALUE, location)
     
     # Load/Offload details - two columns
     col_left = 50
     col_right = 320
     
     # LEFT COLUMN - Loading
-    c.setFont("Helvetica", 9)
-    c.drawString(col_left, y, "Loaded At")
-    c.drawString(col_left + 150, y, "Loaded from Tank")
-    y_left = y - 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(col_left, y_left, str(ticket_data.get('from_location', '')))
-    c.drawString(col_left + 150, y_left, str(ticket_data.get('load_tank', '')))
+    set_font(t, REGULAR_9)
+    draw_row(t, Y_TANK_LABELS, [
+        (col_left, "Loaded At"),
+        (col_left + 150, "Loaded from Tank"),
+    ])
+    set_font(f, BOLD_9)
+    draw_row(f, Y_TANK_VALUES, [
+        (col_left, ticket_value(ticket_data, 'from_location')),
+        (col_left + 150, ticket_value(ticket_data, 'load_tank')),
+    ])
     
     # RIGHT COLUMN - Offloading
-    c.setFont("Helvetica", 9)
-    c.drawString(col_right, y, "Offloaded At")
-    c.drawString(col_right + 150, y, "Offloaded into")
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(col_right, y_left, str(ticket_data.get('to_location', '')))
-    c.drawString(col_right + 150, y_left, str(ticket_data.get('offload_tank', '')))
-    
-    y -= 40
+    set_font(t, REGULAR_9)
+    draw_row(t, Y_TANK_LABELS, [
+        (col_right, "Offloaded At"),
+        (col_right + 150, "Offloaded into"),
+    ])
+    set_font(f, BOLD_9)
+    draw_row(f, Y_TANK_VALUES, [
+        (col_right, ticket_value(ticket_data, 'to_location')),
+        (col_right + 150, ticket_value(ticket_data, 'offload_tank')),
+    ])
     
     # Times
-    c.setFont("Helvetica", 9)
-    c.drawString(col_left, y, "Arrive - Load Location")
-    c.drawString(col_left + 150, y, "Riser")
-    c.drawString(col_right, y, "Arrive - Offload Location")
-    c.drawString(col_right + 150, y, "Riser")
-    y -= 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(col_left, y, str(ticket_data.get('arrive_load', '')))
-    c.drawString(col_left + 150, y, str(ticket_data.get('load_riser', '')))
-    c.drawString(col_right, y, str(ticket_data.get('arrive_offload', '')))
-    c.drawString(col_right + 150, y, str(ticket_data.get('offload_riser', '')))
-    
-    y -= 20
-    c.setFont("Helvetica", 9)
-    c.drawString(col_left, y, "Depart - Load Location")
-    c.drawString(col_right, y, "Depart - Offload Location")
-    y -= 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(col_left, y, str(ticket_data.get('depart_load', '')))
-    c.drawString(col_right, y, str(ticket_data.get('depart_offload', '')))
-    
-    y -= 20
-    c.setFont("Helvetica", 9)
-    c.drawString(col_left, y, "Load Start Vol (m3)")
-    c.drawString(col_left + 120, y, "Load End Vol (m3)")
-    y -= 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(col_left, y, str(ticket_data.get('load_start_vol', '')))
-    c.drawString(col_left + 120, y, str(ticket_data.get('load_end_vol', '')))
-    
-    y -= 30
+    set_font(t, REGULAR_9)
+    draw_row(t, Y_ARRIVE_LABELS, [
+        (col_left, "Arrive - Load Location"),
+        (col_left + 150, "Riser"),
+        (col_right, "Arrive - Offload Location"),
+        (col_right + 150, "Riser"),
+    ])
+    set_font(f, BOLD_9)
+    draw_row(f, Y_ARRIVE_VALUES, [
+        (col_left, ticket_value(ticket_data, 'arrive_load')),
+        (col_left + 150, ticket_value(ticket_data, 'load_riser')),
+        (col_right, ticket_value(ticket_data, 'arrive_offload')),
+        (col_right + 150, ticket_value(ticket_data, 'offload_riser')),
+    ])
+    
+    set_font(t, REGULAR_9)
+    draw_row(t, Y_DEPART_LABELS, [
+        (col_left, "Depart - Load Location"),
+        (col_right, "Depart - Offload Location"),
+    ])
+    set_font(f, BOLD_9)
+    draw_row(f, Y_DEPART_VALUES, [
+        (col_left, ticket_value(ticket_data, 'depart_load')),
+        (col_right, ticket_value(ticket_data, 'depart_offload')),
+    ])
+    
+    set_font(t, REGULAR_9)
+    draw_row(t, Y_VOLUME_LABELS, [
+        (col_left, "Load Start Vol (m3)"),
+        (col_left + 120, "Load End Vol (m3)"),
+    ])
+    set_font(f, BOLD_9)
+    draw_row(f, Y_VOLUME_VALUES, [
+        (col_left, ticket_value(ticket_data, 'load_start_vol')),
+        (col_left + 120, ticket_value(ticket_data, 'load_end_vol')),
+    ])
     
     # Comments
-    c.setFont("Helvetica", 9)
-    c.drawString(col_left, y, "Comments")
-    c.drawString(col_right, y, "Comments")
-    y -= 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(col_left, y, str(ticket_data.get('load_comments', ''))[:40])
-    c.drawString(col_right, y, str(ticket_data.get('offload_comments', ''))[:40])
-    
-    y -= 30
+    set_font(t, REGULAR_9)
+    draw_row(t, Y_COMMENT_LABELS, [
+        (col_left, "Comments"),
+        (col_right, "Comments"),
+    ])
+    set_font(f, BOLD_9)
+    draw_row(f, Y_COMMENT_VALUES, [
+        (col_left, ticket_value(ticket_data, 'load_comments', 40)),
+        (col_right, ticket_value(ticket_data, 'offload_comments', 40)),
+    ])
     
     # === PRODUCT DETAILS ===
-    c.setFont("Helvetica", 9)
-    c.drawString(50, y, "Product")
-    c.drawString(300, y, "Last Contained")
-    y -= 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(50, y, str(ticket_data.get('product', '')))
-    c.drawString(300, y, str(ticket_data.get('last_contained', '')))
-    
-    y -= 25
+    set_font(t, REGULAR_9)
+    draw_row(t, Y_PRODUCT_LABELS, [
+        (50, "Product"),
+        (300, "Last Contained"),
+    ])
+    set_font(f, BOLD_9)
+    draw_row(f, Y_PRODUCT_VALUES, [
+        (50, ticket_value(ticket_data, 'product')),
+        (300, ticket_value(ticket_data, 'last_contained')),
+    ])
     
     # Volume and billing details
-    c.setFont("Helvetica", 9)
+    set_font(t, REGULAR_9)
     cols = [50, 130, 210, 290, 370, 450]
     headers = ["Commodity", "Transport Placard", "BS+W (Cut)", "Density", "Road Ban", ""]
-    for i, h in enumerate(headers):
-        c.drawString(cols[i], y, h)
+    draw_row(t, Y_BILLING_LABELS, zip(cols, headers))
     
-    y -= 12
-    c.setFont("Helvetica-Bold", 9)
+    set_font(f, BOLD_9)
     values = [
-        str(ticket_data.get('commodity', '')),
-        str(ticket_data.get('transport_placard', '')),
-        str(ticket_data.get('bsw', '')),
-        str(ticket_data.get('density', '')),
-        str(ticket_data.get('road_ban', '')),
+        ticket_value(ticket_data, 'commodity', 15),
+        ticket_value(ticket_data, 'transport_placard', 15),
+        ticket_value(ticket_data, 'bsw', 15),
+        ticket_value(ticket_data, 'density', 15),
+        ticket_value(ticket_data, 'road_ban', 15),
         ""
     ]
-    for i, v in enumerate(values):
-        c.drawString(cols[i], y, v[:15])
-    
-    y -= 25
+    draw_row(f, Y_BILLING_VALUES, zip(cols, values))
     
     # Final row
-    c.setFont("Helvetica", 9)
-    c.drawString(50, y, "Estimated Volume")
-    c.drawString(150, y, "Actual Volume")
-    c.drawString(250, y, "Hours Charged")
-    c.drawString(350, y, "Customer Tkt #")
-    y -= 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(50, y, str(ticket_data.get('estimated_volume', '')))
-    c.drawString(150, y, str(ticket_data.get('actual_volume', '')))
-    c.drawString(250, y, str(ticket_data.get('hours_charged', '')))
-    c.drawString(350, y, str(ticket_data.get('customer_ticket', '')))
-    
-    y -= 40
+    set_font(t, REGULAR_9)
+    draw_row(t, Y_TOTALS_LABELS, [
+        (50, "Estimated Volume"),
+        (150, "Actual Volume"),
+        (250, "Hours Charged"),
+        (350, "Customer Tkt #"),
+    ])
+    set_font(f, BOLD_9)
+    draw_row(f, Y_TOTALS_VALUES, [
+        (50, ticket_value(ticket_data, 'estimated_volume')),
+        (150, ticket_value(ticket_data, 'actual_volume')),
+        (250, ticket_value(ticket_data, 'hours_charged')),
+        (350, ticket_value(ticket_data, 'customer_ticket')),
+    ])
     
     # === HAZARD NOTES ===
-    c.line(50, y, width - 50, y)
-    y -= 15
-    c.setFont("Helvetica", 8)
-    c.drawString(50, y, "Hazard at Load: Weather conditions Road in poor condition Spills")
-    y -= 10
-    c.drawString(50, y, "or potential Slips / trips / falls LOADING/UNLOADING PROCEDURES REVIEWED")
-    y -= 15
-    c.drawString(50, y, "Hazard at Offload: Weather conditions Road in poor")
-    y -= 10
-    c.drawString(50, y, "condition Spills or potential Other workers in area Slips / trips")
-    y -= 10
-    c.drawString(50, y, "/ falls LOADING/UNLOADING PROCEDURES REVIEWED")
+    t.line(50, Y_HAZARD_LINE, PAGE_WIDTH - 50, Y_HAZARD_LINE)
+    set_font(t, REGULAR_8)
+    t.drawString(50, Y_HAZARD_TEXT, "Hazard at Load: Weather conditions Road in poor condition Spills")
+    t.drawString(50, Y_HAZARD_TEXT - 10, "or potential Slips / trips / falls LOADING/UNLOADING PROCEDURES REVIEWED")
+    t.drawString(50, Y_HAZARD_TEXT - 25, "Hazard at Offload: Weather conditions Road in poor")
+    t.drawString(50, Y_HAZARD_TEXT - 35, "condition Spills or potential Other workers in area Slips / trips")
+    t.drawString(50, Y_HAZARD_TEXT - 45, "/ falls LOADING/UNLOADING PROCEDURES REVIEWED")
+
+def draw_ticket(c, ticket_data):
+    """Draw one ticket page in Rick's Oilfield Hauling format onto canvas c."""
+    draw_layout(c, c, ticket_data)
+
+def generate_ticket_pdf(ticket_data):
+    """Generate a PDF ticket matching Rick's Oilfield Hauling format."""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter, pageCompression=1)
+    draw_ticket(c, ticket_data)
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+def pdf_filename(ticket_data):
+    """AXON file name for a ticket, or None if it has no usable ticket number.
+    
+    The ticket number comes straight from the sheet, so anything that could
+    leave the target folder ('/', '..') is stripped.
+    """
+    ticket_num = re.sub(r'[^\w-]', '', os.path.basename(str(ticket_data.get('ticket_number', ''))))
+    return f"{ticket_num}_t.pdf" if ticket_num else None
+
+def named_tickets(tickets):
+    """Pair each ticket with its file name, dropping tickets without one."""
+    named = []
+    for ticket in tickets:
+        filename = pdf_filename(ticket)
+        if filename:
+            named.append((filename, ticket))
+    return named
+
+def pdf_cache_key(ticket_data):
+    """Hash of the ticket row and layout version that names its cached PDF."""
+    payload = json.dumps([PDF_LAYOUT_VERSION, ticket_data], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def prune_pdf_cache(tickets):
+    """Delete cached PDFs that no longer match any of the given tickets."""
+    keep = {f"{pdf_cache_key(ticket)}.pdf" for ticket in tickets}
+    try:
+        names = os.listdir(PDF_CACHE_DIR)
+    except OSError:
+        return
+    for name in names:
+        if name.endswith('.pdf') and name not in keep:
+            try:
+                os.remove(os.path.join(PDF_CACHE_DIR, name))
+            except OSError:
+                pass
+
+def cached_ticket_pdf(ticket_data):
+    """Return PDF bytes for a ticket, reusing the file from an earlier run if the row is unchanged."""
+    path = os.path.join(PDF_CACHE_DIR, f"{pdf_cache_key(ticket_data)}.pdf")
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        pass
     
-    # Save PDF
+    pdf_bytes = generate_ticket_pdf(ticket_data).getvalue()
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return pdf_bytes
+
+def generate_combined_pdf(tickets):
+    """Generate one PDF with a page per ticket."""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter, pageCompression=1)
+    
+    # Labels and lines are stored once as a form; each page only adds its values
+    c.beginForm('ticket_template')
+    draw_layout(c, SkipDrawing(), {})
+    c.endForm()
+    
+    for ticket_data in tickets:
+        c.doForm('ticket_template')
+        draw_layout(SkipDrawing(), c, ticket_data)
+        c.showPage()
     c.save()
     buffer.seek(0)
     return buffer
@@ -273,21 +497,20 @@ st.markdown("Generate `_t` ticket PDFs for AXON attachments")
 
 st.divider()
 
-# Load completed tickets
-tickets = load_completed_tickets()
+# Load the ticket picker; full rows are only fetched for the selected ticket
+ticket_options = load_ticket_index()
 
-if not tickets:
+if not ticket_options:
     st.warning("No completed tickets found. Complete some tickets in the Driver app first.")
 else:
-    st.success(f"Found {len(tickets)} completed tickets")
+    st.success(f"Found {len(ticket_options)} completed tickets")
     
     # Select ticket to generate PDF
-    ticket_options = {f"{t.get('ticket_number', 'N/A')} - {t.get('customer', 'Unknown')} ({t.get('date', '')})": t for t in tickets}
-    
     selected = st.selectbox("Select a ticket to generate PDF:", list(ticket_options.keys()))
     
     if selected:
-        ticket = ticket_options[selected]
+        entry = ticket_options[selected]
+        ticket = load_ticket_row(entry['row'], entry.get('ticket_number', ''))
         
         # Show ticket preview
         col1, col2 = st.columns(2)
@@ -313,8 +536,7 @@ else:
             with st.spinner("Generating PDF..."):
                 pdf_buffer = generate_ticket_pdf(ticket)
                 
-                ticket_num = ticket.get('ticket_number', 'unknown')
-                filename = f"{ticket_num}_t.pdf"
+                filename = pdf_filename(ticket) or "unknown_t.pdf"
                 
                 st.success(f"✅ PDF generated: {filename}")
                 
@@ -335,26 +557,84 @@ st.markdown("### 📦 Bulk Generate PDFs")
 st.markdown("Generate PDFs for all tickets that don't have one yet")
 
 if st.button("Generate All Missing PDFs"):
+    tickets = load_completed_tickets()
+    named = named_tickets(tickets)
+    if named:
+        progress = st.progress(0)
+        # Redraw the bar about every 5% rather than once per ticket
+        report_every = max(1, len(named) // 20)
+        zip_buffer = BytesIO()
+        
+        # Tickets are independent, so render them across a thread pool and add
+        # each one to the zip from this thread as it finishes. ReportLab already
+        # compresses the PDFs, so they are stored rather than deflated again.
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor, \
+                zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_STORED) as archive:
+            futures = {executor.submit(cached_ticket_pdf, ticket): name for name, ticket in named}
+            for done, future in enumerate(as_completed(futures), 1):
+                archive.writestr(futures[future], future.result())
+                if done % report_every == 0 or done == len(named):
+                    progress.progress(done / len(named))
+        
+        # Every completed ticket was just generated, so anything else is stale
+        prune_pdf_cache(tickets)
+        
+        filename = f"tickets_{datetime.now().strftime('%Y%m%d_%H%M')}.zip"
+        st.success(f"✅ Generated {len(named)} PDFs")
+        if len(named) < len(tickets):
+            st.warning(f"Skipped {len(tickets) - len(named)} tickets without a ticket number")
+        st.download_button(
+            label=f"⬇️ Download {filename}",
+            data=zip_buffer.getvalue(),
+            file_name=filename,
+            mime="application/zip",
+            type="primary"
+        )
+    else:
+        st.warning("No tickets to generate")
+
+if st.button("Generate Combined PDF"):
+    tickets = load_completed_tickets()
     if tickets:
+        with st.spinner("Generating PDF..."):
+            pdf_buffer = generate_combined_pdf(tickets)
+        
+        filename = f"tickets_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+        st.success(f"✅ Generated {filename} ({len(tickets)} tickets)")
+        st.download_button(
+            label=f"⬇️ Download {filename}",
+            data=pdf_buffer,
+            file_name=filename,
+            mime="application/pdf",
+            type="primary"
+        )
+    else:
+        st.warning("No tickets to generate")
+
+output_dir = st.text_input("Save folder", value=PDF_OUTPUT_DIR)
+
+if st.button("Save All PDFs to Folder"):
+    tickets = load_completed_tickets()
+    named = named_tickets(tickets)
+    if named:
         progress = st.progress(0)
-        generated = []
+        report_every = max(1, len(named) // 20)
+        os.makedirs(output_dir, exist_ok=True)
         
-        for i, ticket in enumerate(tickets):
-            pdf_buffer = generate_ticket_pdf(ticket)
-            ticket_num = ticket.get('ticket_number', f'ticket_{i}')
-            filename = f"{ticket_num}_t.pdf"
-            generated.append((filename, pdf_buffer.getvalue()))
-            progress.progress((i + 1) / len(tickets))
+        # PDFs come from the disk cache where possible, and each one is written
+        # out as soon as it is ready, so memory use doesn't grow with the ticket count
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            futures = {executor.submit(cached_ticket_pdf, ticket): name for name, ticket in named}
+            for done, future in enumerate(as_completed(futures), 1):
+                with open(os.path.join(output_dir, futures[future]), 'wb') as f:
+                    f.write(future.result())
+                if done % report_every == 0 or done == len(named):
+                    progress.progress(done / len(named))
         
-        st.success(f"✅ Generated {len(generated)} PDFs")
+        prune_pdf_cache(tickets)
         
-        # Create download buttons for each
-        for filename, pdf_data in generated:
-            st.download_button(
-                label=f"⬇️ {filename}",
-                data=pdf_data,
-                file_name=filename,
-                mime="application/pdf"
-            )
+        st.success(f"✅ Saved {len(named)} PDFs to {os.path.abspath(output_dir)}")
+        if len(named) < len(tickets):
+            st.warning(f"Skipped {len(tickets) - len(named)} tickets without a ticket number")
     else:
         st.warning("No tickets to generate")